@@ -1,411 +1,425 @@
-from flask import Flask, request, render_template, send_file, jsonify
-import whisper
+from flask import Flask, request, render_template, send_file, jsonify, Response
+import io
+import json
+import math
 import os
-import re
 import threading
-import yt_dlp
+import time
 import uuid
-import subprocess
-import numpy as np
-from whisper.audio import SAMPLE_RATE
+import zipfile
+from pipeline import (AVAILABLE_MODELS, MODEL_NAME, audio_download_options, download_audio, download_video,
+                      expand_playlist, extract_video_id, init_inference, save_transcript, throughput,
+                      transcribe_video, video_info)
+from transcript_cache import TranscriptCache, cache_key
+from scheduler import JobScheduler, QueueFull, default_worker_count
+from transcoder import TranscodeQueue, run_ffmpeg
+from event_stream import EventHub, format_sse
+from job_store import open_store
+from download_pool import DownloadPool
+from artifact_index import ArtifactIndex
+from search_index import TranscriptIndex
+from transcript import Transcript
+import metrics
+import pipeline
 
 app = Flask(__name__)
 
-# Set the path to FFmpeg before loading the model
-os.environ["PATH"] = os.getcwd() + os.pathsep + os.environ.get("PATH", "")
-model = whisper.load_model("base")  # "tiny", "base", "small", "medium", "large"
+# Send transcription jobs to Celery workers (see tasks.py) instead of running them here
+DISTRIBUTED = os.environ.get("DISTRIBUTED_TRANSCRIPTION", "0") == "1"
+if DISTRIBUTED:
+    from tasks import read_chunks, transcribe_video as transcribe_task
 
-# Dictionary to store task status and video info
-tasks = {}
-video_info = {}
+# Seconds between checks on the progress of a job running on a Celery worker
+REMOTE_POLL_INTERVAL = float(os.environ.get("REMOTE_POLL_INTERVAL", "1"))
 
-def extract_video_id(url):
-    """Extract video ID from various YouTube URL formats"""
-    patterns = [
-        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-        r'youtu\.be\/([0-9A-Za-z_-]{11})',
-        r'youtube\.com\/embed\/([0-9A-Za-z_-]{11})'
-    ]
+# Files ready for download, indexed in memory with their ETags and evicted once over budget
+artifact_store = ArtifactIndex(
+    "downloads",
+    max_bytes=int(os.environ.get("DOWNLOADS_MAX_MB", "20480")) * 1024 * 1024 or None,
+    stale_after=int(os.environ.get("PARTIAL_FILE_TTL_MINUTES", "60")) * 60
+)
+
+# Task status, in memory or in SQLite shared by every web worker (JOB_STORE)
+tasks = open_store('tasks', ttl=int(os.environ.get("TASK_TTL_HOURS", "24")) * 3600)
+
+# (video ID, model) pairs currently being processed mapped to their job ID, the task IDs of
+# every request attached to each job, and the job each task ID belongs to
+inflight = {}
+subscribers = {}
+job_of = {}
+jobs_lock = threading.Lock()
+
+# Live progress and transcript text of running jobs, streamed to clients over SSE
+event_hub = EventHub()
+
+# Videos of playlists and URL lists submitted together
+batches = open_store('batches', ttl=int(os.environ.get("TASK_TTL_HOURS", "24")) * 3600)
+BATCH_MAX_VIDEOS = int(os.environ.get("BATCH_MAX_VIDEOS", "200"))
+
+# Refuse new jobs predicted to complete more than this many seconds from now (0 = never)
+MAX_PREDICTED_SECONDS = int(os.environ.get("MAX_PREDICTED_SECONDS", "0"))
+
+# Most hits /search returns
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "50"))
+
+def build_mp3(video_id, report):
+    """Produce the MP3 for download, fetching the audio again if the original is gone"""
+    info = video_info[video_id]
+    audio_file = info.get('original_audio_file')
+    if not audio_file or not os.path.exists(audio_file):
+        audio_file, _ = download_audio(info['url'], video_id)
     
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    # Convert to MP3 for download (if not already MP3)
+    if audio_file.endswith('.mp3'):
+        return audio_file
     
-    return None
+    # Written under a partial name until complete, so a crash never leaves a truncated MP3
+    mp3_audio = artifact_store.path(video_id, 'mp3')
+    print(f"Converting {audio_file} to MP3 for download...")
+    cmd = [
+        '.\\ffmpeg.exe',
+        '-y',
+        '-i', audio_file,
+        '-acodec', 'mp3',
+        '-ab', '192k',
+        '-f', 'mp3',
+        f'{mp3_audio}.part'
+    ]
+    with metrics.span('transcode', format='mp3'):
+        converted = run_ffmpeg(cmd, info.get('duration'), report)
+    if not converted:
+        return audio_file
+    os.replace(f'{mp3_audio}.part', mp3_audio)
+    return mp3_audio
 
-def convert_to_wav(input_file, output_file):
-    """Convert audio file to WAV format using FFmpeg"""
+def build_mp4(video_id, report):
+    """Download the video and produce the MP4 for download"""
+    info = video_info[video_id]
+    
+    # The download is the first half of the progress, the transcode the second
+    video_file = download_video(info['url'], video_id, report=lambda progress: report(progress / 2))
+    
+    # Convert video to MP4 for download (if not already MP4)
+    if video_file.endswith('.mp4'):
+        return video_file
+    
+    mp4_video = artifact_store.path(video_id, 'mp4')
+    print(f"Converting {video_file} to MP4 for download...")
+    cmd = [
+        '.\\ffmpeg.exe',
+        '-y',
+        '-i', video_file,
+        '-c:v', 'libx264',
+        '-c:a', 'aac',
+        '-preset', 'fast',
+        '-f', 'mp4',
+        f'{mp4_video}.part'
+    ]
+    with metrics.span('transcode', format='mp4'):
+        converted = run_ffmpeg(cmd, info.get('duration'), lambda progress: report(0.5 + progress / 2))
+    if not converted:
+        return video_file
+    os.replace(f'{mp4_video}.part', mp4_video)
+    
+    # Remove original video now that the MP4 exists
     try:
-        # Check if input file exists
-        if not os.path.exists(input_file):
-            print(f"Input file does not exist: {input_file}")
-            return False
-            
-        # Use the local ffmpeg.exe
-        cmd = [
-            '.\\ffmpeg.exe',
-            '-i', input_file,
-            '-ar', '16000',
-            '-ac', '1',
-            '-c:a', 'pcm_s16le',
-            output_file
-        ]
-        
-        print(f"Running command: {' '.join(cmd)}")
-        
-        # Run the command and capture output
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"FFmpeg error: {result.stderr}")
-            return False
-            
-        # Check if output file was created
-        if not os.path.exists(output_file):
-            print(f"Output file was not created: {output_file}")
-            return False
-            
-        print(f"Successfully converted {input_file} to {output_file}")
-        return True
+        os.remove(video_file)
+        print(f"Removed original video file: {video_file}")
     except Exception as e:
-        print(f"Error converting to WAV: {str(e)}")
-        return False
+        print(f"Error removing original video file: {str(e)}")
+    return mp4_video
+
+# Subtitle and structured transcript formats generated from the saved Transcript
+TRANSCRIPT_FORMATS = {
+    'srt': ('application/x-subrip', lambda transcript, info: transcript.to_srt()),
+    'vtt': ('text/vtt', lambda transcript, info: transcript.to_vtt()),
+    'json': ('application/json', lambda transcript, info: transcript.to_json(**info)),
+}
+
+# Builders for the artifacts produced on demand by the transcoding queue
+ARTIFACT_BUILDERS = {
+    'mp3': build_mp3,
+    'mp4': build_mp4,
+}
+
+def request_artifact(video_id, format, retry=False):
+    """Queue an MP3/MP4 artifact to be built in the background and return its job state
+
+    A recent failure is returned as is unless retry is set.
+    """
+    builder = ARTIFACT_BUILDERS[format]
+    
+    def build(report):
+        # Keep the source files around while the artifact is built from them
+        artifact_store.pin(video_id)
+        try:
+            return artifact_store.add(video_id, format, builder(video_id, report))['path']
+        finally:
+            artifact_store.unpin(video_id)
+    
+    return transcode_queue.request(video_id, format, build, retry=retry)
+
+def queue_wait(position):
+    """Estimated seconds until the job at a 1-based queue position starts"""
+    # Every job ahead of it, running or queued, holds a worker for about one average job
+    ahead = scheduler.active_jobs() + position - 1
+    rounds = math.ceil(max(ahead - scheduler.workers + 1, 0) / scheduler.workers)
+    return rounds * throughput.job_seconds(MODEL_NAME)
+
+def predicted_seconds(position, model_name):
+    """Estimated seconds until a job at a queue position has its transcript"""
+    return queue_wait(position) + throughput.job_seconds(model_name)
+
+def set_job_state(job_id, state):
+    """Update the state of every task attached to a job"""
+    with jobs_lock:
+        tasks.set_many({task_id: state for task_id in subscribers.get(job_id, [])})
+    event_hub.publish(job_id, 'state', state)
 
-def download_media(url, video_id):
-    """Download both audio and video using yt-dlp"""
+def forget_job(job_id, key):
+    """Drop a job from the in-flight tables; the caller holds jobs_lock"""
+    if inflight.get(key) == job_id:
+        del inflight[key]
+        artifact_store.unpin(key[0])
+    for task_id in subscribers.pop(job_id, []):
+        job_of.pop(task_id, None)
+        tasks.unpin(task_id)
+
+def release_job(job_id, key):
+    """Forget a finished or cancelled job so the video can be submitted again"""
+    with jobs_lock:
+        forget_job(job_id, key)
+    event_hub.close(job_id)
+
+def index_transcript(video_id):
+    """Add a saved transcript, and the audio it was made from, to the artifact store"""
+    artifact_store.add(video_id, 'txt', artifact_store.path(video_id, 'txt'))
+    artifact_store.add(video_id, 'npz', artifact_store.path(video_id, 'npz'))
+    audio_file = (video_info.get(video_id) or {}).get('original_audio_file')
+    if audio_file and os.path.exists(audio_file):
+        artifact_store.add(video_id, 'audio', audio_file)
+
+def index_saved_transcripts():
+    """Add transcripts saved before the search index existed, or by other nodes, to it"""
+    for video_id in artifact_store.videos('npz'):
+        if video_id in search_index:
+            continue
+        try:
+            # The header of the text file has the title, URL and language
+            header = {}
+            with open(artifact_store.path(video_id, 'txt'), encoding='utf-8') as f:
+                for line in f:
+                    if ': ' not in line:
+                        break
+                    name, value = line.rstrip('\n').split(': ', 1)
+                    header[name] = value
+            search_index.add(
+                video_id, Transcript.load(artifact_store.path(video_id, 'npz')).segments(),
+                title=header.get('Title'), url=header.get('URL'), language=header.get('Language')
+            )
+        except Exception as e:
+            print(f"Error indexing saved transcript {video_id}: {str(e)}")
+
+def finish_job(job_id, result):
+    """Save a finished transcript, cache it and mark the job's tasks as done"""
+    # Update task status
+    set_job_state(job_id, {
+        'state': 'PROGRESS',
+        'status': {'current': 9, 'total': 10, 'status': 'Saving transcription...'}
+    })
+    
+    # Save transcription
     try:
-        # Get the current working directory
-        current_dir = os.getcwd()
-        
-        # Ensure downloads directory exists
-        downloads_dir = os.path.join(current_dir, "downloads")
-        os.makedirs(downloads_dir, exist_ok=True)
-        
-        # File paths
-        original_audio = os.path.join(downloads_dir, f'{video_id}_audio')
-        original_video = os.path.join(downloads_dir, f'{video_id}_video')
-        wav_audio = os.path.join(downloads_dir, f'{video_id}_audio.wav')
-        mp3_audio = os.path.join(downloads_dir, f'{video_id}_audio.mp3')
-        mp4_video = os.path.join(downloads_dir, f'{video_id}_video.mp4')
-        
-        # Clean up any existing files
-        for ext in ['mp3', 'webm', 'm4a', 'opus', 'wav', 'mp4']:
-            for base_name in [original_audio, original_video]:
-                test_file = f"{base_name}.{ext}"
-                if os.path.exists(test_file):
-                    try:
-                        os.remove(test_file)
-                        print(f"Removed existing file: {test_file}")
-                    except:
-                        pass
-        
-        # Download audio
-        audio_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': f'{original_audio}.%(ext)s',
-            'quiet': False,
-            'no_warnings': False,
-            'ffmpeg_location': '.',
-        }
-        
-        # Download video
-        video_opts = {
-            'format': 'best[height<=720]/best',  # Download best quality up to 720p
-            'outtmpl': f'{original_video}.%(ext)s',
-            'quiet': False,
-            'no_warnings': False,
-            'ffmpeg_location': '.',
-        }
-        
-        with yt_dlp.YoutubeDL(audio_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            print(f"Downloading audio: {info['title']}")
-            ydl.download([url])
-        
-        with yt_dlp.YoutubeDL(video_opts) as ydl:
-            print(f"Downloading video: {info['title']}")
-            ydl.download([url])
-            
-        # Find the downloaded audio file
-        audio_file = None
-        for ext in ['mp3', 'webm', 'm4a', 'opus']:
-            test_file = f"{original_audio}.{ext}"
-            if os.path.exists(test_file):
-                audio_file = test_file
-                print(f"Found downloaded audio file: {audio_file}")
-                break
-        
-        if not audio_file:
-            raise Exception("Could not find downloaded audio file")
-        
-        # Find the downloaded video file
-        video_file = None
-        for ext in ['mp4', 'webm', 'mkv']:
-            test_file = f"{original_video}.{ext}"
-            if os.path.exists(test_file):
-                video_file = test_file
-                print(f"Found downloaded video file: {video_file}")
-                break
-        
-        if not video_file:
-            print("Warning: Could not find downloaded video file")
-            video_file = None
-        
-        # Store video info for later use
-        video_info[video_id] = {
-            'title': info.get('title', 'Unknown Title'),
-            'url': url,
-            'original_audio_file': audio_file,
-            'original_video_file': video_file
+        result["txt_file"] = save_transcript(result)
+        index_transcript(result["video_id"])
+    except Exception as e:
+        set_job_state(job_id, {
+            'state': 'FAILURE',
+            'status': f'Error saving transcription: {str(e)}'
+        })
+        return
+    
+    # Jobs run elsewhere leave no video info on this node, which downloads need
+    if result["video_id"] not in video_info:
+        video_info[result["video_id"]] = {
+            'title': result["title"],
+            'url': result["url"],
+            'duration': result["duration"]
         }
-        
-        # Convert to WAV format for Whisper
-        print(f"Converting {audio_file} to WAV format...")
-        if not convert_to_wav(audio_file, wav_audio):
-            raise Exception("Failed to convert audio to WAV format")
-        
-        # Convert to MP3 for download (if not already MP3)
-        if not audio_file.endswith('.mp3'):
-            print(f"Converting {audio_file} to MP3 for download...")
-            cmd = [
-                '.\\ffmpeg.exe',
-                '-i', audio_file,
-                '-acodec', 'mp3',
-                '-ab', '192k',
-                mp3_audio
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
-                mp3_audio = audio_file
-        else:
-            mp3_audio = audio_file
-        
-        # Convert video to MP4 for download (if not already MP4)
-        if video_file and not video_file.endswith('.mp4'):
-            print(f"Converting {video_file} to MP4 for download...")
-            cmd = [
-                '.\\ffmpeg.exe',
-                '-i', video_file,
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-preset', 'fast',
-                mp4_video
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
-                mp4_video = video_file
-        else:
-            mp4_video = video_file if video_file else None
-        
-        # Remove original files if they're different from the final files
-        if audio_file != mp3_audio and os.path.exists(audio_file):
-            try:
-                os.remove(audio_file)
-                print(f"Removed original audio file: {audio_file}")
-            except Exception as e:
-                print(f"Error removing original audio file: {str(e)}")
-        
-        if video_file and video_file != mp4_video and os.path.exists(video_file):
-            try:
-                os.remove(video_file)
-                print(f"Removed original video file: {video_file}")
-            except Exception as e:
-                print(f"Error removing original video file: {str(e)}")
-        
-        return wav_audio, mp3_audio, mp4_video, info.get('title', 'Unknown Title')
+    
+    # Make the transcript searchable; a failure here does not lose the transcript
+    try:
+        search_index.add(
+            result["video_id"], result["segments"],
+            title=result["title"], url=result["url"], language=result["language"], model=result["model"]
+        )
     except Exception as e:
-        print(f"Error in download_media: {str(e)}")
-        raise Exception(f"Error downloading media: {str(e)}")
+        print(f"Error indexing transcript for search: {str(e)}")
+    
+    # Return the result
+    transcript_cache.put(cache_key(result["video_id"], result["model"]), result)
+    set_job_state(job_id, {
+        'state': 'SUCCESS',
+        'result': result
+    })
 
-def transcribe_video(task_id, url):
-    """Function to transcribe video in background thread"""
+def run_job(job_id, url, video_id, model_name, artifacts=(), audio_file=None):
+    """Run a transcription job and release its video ID once it is done"""
     try:
-        # Update task status
-        tasks[task_id] = {
-            'state': 'PROGRESS',
-            'status': {'current': 1, 'total': 10, 'status': 'Extracting video info...'}
-        }
-        
-        # Extract video ID and validate
-        video_id = extract_video_id(url)
-        if not video_id:
-            tasks[task_id] = {
-                'state': 'FAILURE',
-                'status': 'Invalid YouTube URL format'
-            }
-            return
-        
-        # Update task status
-        tasks[task_id] = {
-            'state': 'PROGRESS',
-            'status': {'current': 2, 'total': 10, 'status': 'Downloading media...'}
-        }
-        
-        # Download media using yt-dlp
-        try:
-            wav_audio, mp3_audio, mp4_video, video_title = download_media(url, video_id)
-            
-            # Verify the audio file exists and is accessible
-            if not os.path.exists(wav_audio):
-                tasks[task_id] = {
-                    'state': 'FAILURE',
-                    'status': f'Audio file not found: {wav_audio}'
-                }
-                return
+        result = transcribe_video(
+            url,
+            report=lambda state: set_job_state(job_id, state),
+            model_name=model_name,
+            audio_file=audio_file,
+            on_chunk=lambda chunk: event_hub.publish(job_id, 'chunk', chunk),
+            # Produce the MP3/MP4 downloads the job asked for alongside the transcription
+            on_media_info=lambda video_id: [request_artifact(video_id, format) for format in artifacts]
+        )
+        if result:
+            finish_job(job_id, result)
+    finally:
+        release_job(job_id, (video_id, model_name))
+
+def run_remote_job(job_id, url, video_id, model_name, artifacts=(), audio_file=None):
+    """Send a transcription job to the Celery workers and relay its progress until it is done
+
+    Workers download the audio themselves, so audio_file is not used.
+    """
+    try:
+        async_result = transcribe_task.apply_async(args=[url, model_name], task_id=job_id)
+        published = 0
+        while not async_result.ready():
+            if async_result.state == 'PROGRESS':
+                status = dict(async_result.info or {})
                 
-            # Get file size to verify it's not empty
-            file_size = os.path.getsize(wav_audio)
-            if file_size == 0:
-                tasks[task_id] = {
-                    'state': 'FAILURE',
-                    'status': 'Downloaded audio file is empty'
-                }
-                return
+                # Workers report how many chunks they have transcribed; fetch and pass on the new ones
+                count = status.pop('chunks', 0)
+                for chunk in read_chunks(job_id, published, count):
+                    event_hub.publish(job_id, 'chunk', chunk)
+                    published += 1
                 
-            print(f"Audio file: {wav_audio}, Size: {file_size} bytes")
-        except Exception as e:
-            tasks[task_id] = {
-                'state': 'FAILURE',
-                'status': str(e)
-            }
-            return
-        
-        # Update task status
-        tasks[task_id] = {
-            'state': 'PROGRESS',
-            'status': {'current': 3, 'total': 10, 'status': 'Preparing audio for transcription...'}
-        }
-        
-        # Load audio and prepare for chunked transcription
-        try:
-            audio = whisper.load_audio(wav_audio)
-            audio_duration = len(audio) / SAMPLE_RATE
-            print(f"Audio duration: {audio_duration:.2f} seconds")
-        except Exception as e:
-            tasks[task_id] = {
+                set_job_state(job_id, {'state': 'PROGRESS', 'status': status})
+            time.sleep(REMOTE_POLL_INTERVAL)
+        
+        # Chunks transcribed after the last poll
+        for chunk in read_chunks(job_id, published):
+            event_hub.publish(job_id, 'chunk', chunk)
+        
+        result = async_result.get(propagate=False)
+        if isinstance(result, dict) and result.get("success"):
+            finish_job(job_id, result)
+            for format in artifacts:
+                request_artifact(video_id, format)
+        else:
+            error = result.get("error") if isinstance(result, dict) else str(result)
+            set_job_state(job_id, {
                 'state': 'FAILURE',
-                'status': f'Error loading audio: {str(e)}'
-            }
-            return
-        
-        # Update task status
+                'status': error or 'Transcription failed'
+            })
+    except Exception as e:
+        set_job_state(job_id, {
+            'state': 'FAILURE',
+            'status': f'Error running remote transcription: {str(e)}'
+        })
+    finally:
+        release_job(job_id, (video_id, model_name))
+
+def restore_transcript(result):
+    """Save a cached transcript again if its files were evicted from the artifact store
+
+    Cached results keep no word timings, so restored JSON downloads have
+    segment timings only.
+    """
+    video_id = result["video_id"]
+    if artifact_store.get(video_id, 'txt') and artifact_store.get(video_id, 'npz'):
+        return
+    try:
+        result["txt_file"] = save_transcript(dict(result))
+        index_transcript(video_id)
+    except Exception as e:
+        print(f"Error restoring transcript {video_id}: {str(e)}")
+
+def attach_job(task_id, video_id, model_name):
+    """Attach a task to the job already processing a video with a model and return its ID, or None
+
+    The caller holds jobs_lock. The tasks of running jobs are pinned in the
+    task store, so the bounded in-memory store never evicts the entry the
+    new task copies its state from.
+    """
+    job_id = inflight.get((video_id, model_name))
+    if job_id is not None:
+        tasks.pin(task_id)
+        tasks[task_id] = tasks[subscribers[job_id][0]]
+        subscribers[job_id].append(task_id)
+        job_of[task_id] = job_id
+    return job_id
+
+def submit_job(task_id, url, video_id, model_name, priority=0, artifacts=(), audio_file=None):
+    """Attach a task to the job already processing a video, or queue a new job for it
+
+    Returns (job_id, attached). Raises QueueFull if a new job was needed
+    but the queue has no room.
+    """
+    with jobs_lock:
+        job_id = attach_job(task_id, video_id, model_name)
+        if job_id is not None:
+            return job_id, True
+        
+        job_id = str(uuid.uuid4())
+        inflight[(video_id, model_name)] = job_id
+        subscribers[job_id] = [task_id]
+        job_of[task_id] = job_id
+        event_hub.open(job_id)
+        artifact_store.pin(video_id)
+        tasks.pin(task_id)
         tasks[task_id] = {
-            'state': 'PROGRESS',
-            'status': {'current': 4, 'total': 10, 'status': 'Starting transcription...'}
+            'state': 'PENDING',
+            'status': 'Waiting in queue...',
+            'model': model_name
         }
         
-        # Transcribe with language detection using chunked approach
+        # Queue the job for the worker pool
         try:
-            # Split audio into chunks of 30 seconds each
-            chunk_duration = 30  # seconds
-            chunk_length = chunk_duration * SAMPLE_RATE
-            chunks = [audio[i:i+chunk_length] for i in range(0, len(audio), chunk_length)]
-            total_chunks = len(chunks)
-            
-            transcription_parts = []
-            detected_language = None
-            
-            # Start transcription phase (steps 4 to 8)
-            for i, chunk in enumerate(chunks):
-                # Calculate progress within the transcription phase (4 to 8)
-                progress_in_transcription = (i / total_chunks) * 4  # 4 is the range from 4 to 8
-                current_progress = 4 + progress_in_transcription
-                
-                # Update task status for each chunk
-                tasks[task_id] = {
-                    'state': 'PROGRESS',
-                    'status': {
-                        'current': current_progress, 
-                        'total': 10, 
-                        'status': f'Transcribing chunk {i+1}/{total_chunks} ({(i+1)*chunk_duration}/{int(audio_duration)}s)...'
-                    }
-                }
-                
-                # Transcribe the chunk
-                result = model.transcribe(
-                    chunk,
-                    fp16=False,
-                    language=None,
-                    task="transcribe",
-                    verbose=False
-                )
-                
-                # Set language from first chunk
-                if i == 0:
-                    detected_language = result.get("language", "unknown")
-                
-                transcription_parts.append(result["text"])
-            
-            # Combine all transcriptions
-            transcription = " ".join(transcription_parts)
-            print(f"Transcription completed. Language: {detected_language}")
-            
-        except Exception as e:
-            tasks[task_id] = {
-                'state': 'FAILURE',
-                'status': f'Error transcribing audio: {str(e)}'
-            }
+            runner = run_remote_job if DISTRIBUTED else run_job
+            scheduler.submit(
+                job_id, runner, (job_id, url, video_id, model_name, artifacts, audio_file), priority=priority
+            )
+        except QueueFull:
+            del inflight[(video_id, model_name)]
+            del subscribers[job_id]
+            del job_of[task_id]
+            del tasks[task_id]
+            tasks.unpin(task_id)
+            event_hub.close(job_id)
+            artifact_store.unpin(video_id)
+            raise
+        return job_id, False
+
+def prefetch_audio(ydl, task_id, url, video_id, model_name, priority=0):
+    """Download a batch video's audio on the download pool, then queue its transcription
+
+    download_audio() holds the video's download lock and reuses audio that
+    is already there, so a job or another batch working on the same video
+    shares the download instead of racing it.
+    """
+    # Another request may have started this video while the task waited for a download slot
+    with jobs_lock:
+        if attach_job(task_id, video_id, model_name) is not None:
             return
-        
-        # Update task status
-        tasks[task_id] = {
-            'state': 'PROGRESS',
-            'status': {'current': 9, 'total': 10, 'status': 'Saving transcription...'}
-        }
-        
-        # Save transcription
+    
+    try:
+        audio_file, _ = download_audio(url, video_id, ydl=ydl)
+    except Exception as e:
+        tasks[task_id] = {'state': 'FAILURE', 'status': str(e)}
+        return
+    
+    # Hold this download slot until the queue has room, so a large batch cannot overrun it
+    while True:
         try:
-            txt_filename = f"downloads/{video_id}.txt"
-            with open(txt_filename, "w", encoding="utf-8") as f:
-                f.write(f"Title: {video_title}\n")
-                f.write(f"URL: {url}\n")
-                f.write(f"Language: {detected_language}\n\n")
-                f.write(transcription)
-        except Exception as e:
-            tasks[task_id] = {
-                'state': 'FAILURE',
-                'status': f'Error saving transcription: {str(e)}'
-            }
+            submit_job(task_id, url, video_id, model_name, priority=priority, audio_file=audio_file)
             return
-        
-        # Update task status
-        tasks[task_id] = {
-            'state': 'PROGRESS',
-            'status': {'current': 10, 'total': 10, 'status': 'Cleaning up...'}
-        }
-        
-        # Clean up WAV file (but keep MP3 and MP4 for download)
-        try:
-            os.remove(wav_audio)
-            print(f"Removed WAV file: {wav_audio}")
-        except Exception as e:
-            print(f"Error removing WAV file: {str(e)}")
-        
-        # Return the result
-        tasks[task_id] = {
-            'state': 'SUCCESS',
-            'result': {
-                "success": True,
-                "transcription": transcription,
-                "title": video_title,
-                "video_id": video_id,
-                "language": detected_language,
-                "txt_file": txt_filename,
-                "mp3_file": mp3_audio,
-                "mp4_file": mp4_video
-            }
-        }
-        
-    except Exception as e:
-        tasks[task_id] = {
-            'state': 'FAILURE',
-            'status': f'Unexpected error: {str(e)}'
-        }
+        except QueueFull:
+            time.sleep(5)
 
 @app.route('/')
 def index():
@@ -420,72 +434,460 @@ def transcribe():
         if not video_id:
             return jsonify({"success": False, "error": "Invalid YouTube URL format"})
         
+        # Short clips can go to a small model for speed, important ones to a larger one
+        model_name = request.form.get('model') or MODEL_NAME
+        if model_name not in AVAILABLE_MODELS:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown model '{model_name}'. Available models: {', '.join(AVAILABLE_MODELS)}"
+            }), 400
+        
+        # Check every parameter before any shared job state is touched
+        try:
+            priority = int(request.form.get('priority', 0))
+        except ValueError:
+            return jsonify({"success": False, "error": "priority must be an integer"}), 400
+        
         # Generate a unique task ID
         task_id = str(uuid.uuid4())
         
-        # Initialize task status
-        tasks[task_id] = {
-            'state': 'PENDING',
-            'status': 'Pending...'
-        }
-        
-        # Start the background thread
-        thread = threading.Thread(target=transcribe_video, args=(task_id, url))
-        thread.start()
+        # Serve finished transcriptions straight from the cache
+        cached = transcript_cache.get(cache_key(video_id, model_name))
+        metrics.cache_requests.inc(result='hit' if cached else 'miss')
+        if cached:
+            restore_transcript(cached)
+            tasks[task_id] = {
+                'state': 'SUCCESS',
+                'result': cached
+            }
+            return jsonify({
+                "success": True,
+                "task_id": task_id,
+                "video_id": video_id,
+                "cached": True,
+                "message": "Transcription loaded from cache."
+            })
+        
+        # Shed load instead of queueing jobs that would take too long to complete
+        eta = predicted_seconds(scheduler.queue_depth() + 1, model_name)
+        if MAX_PREDICTED_SECONDS and eta > MAX_PREDICTED_SECONDS and (video_id, model_name) not in inflight:
+            response = jsonify({
+                "success": False,
+                "error": f"The server is busy (predicted wait {int(eta)}s). Please try again later.",
+                "eta_seconds": round(eta)
+            })
+            response.headers['Retry-After'] = str(int(eta - MAX_PREDICTED_SECONDS) + 1)
+            return response, 429
+        
+        # Attach to the job already processing this video, or queue a new one
+        try:
+            formats = [
+                format for format in request.form.get('artifacts', '').split(',')
+                if format in ARTIFACT_BUILDERS
+            ]
+            job_id, attached = submit_job(
+                task_id, url, video_id, model_name,
+                priority=priority,
+                artifacts=formats
+            )
+        except QueueFull:
+            return jsonify({
+                "success": False,
+                "error": "The server is busy. Please try again in a few minutes."
+            }), 429
+        
+        if attached:
+            return jsonify({
+                "success": True,
+                "task_id": task_id,
+                "video_id": video_id,
+                "message": "This video is already being transcribed. Please wait..."
+            })
         
         # Return the task ID so the client can check status
+        eta = predicted_seconds(scheduler.position(job_id) or 1, model_name)
         return jsonify({
             "success": True,
             "task_id": task_id,
             "video_id": video_id,
+            "eta_seconds": round(eta),
+            "completes_at": time.time() + eta,
             "message": "Transcription started. Please wait..."
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
+@app.route('/batch', methods=['POST'])
+def submit_batch():
+    """Transcribe every video of a playlist or channel (url) or of a list of URLs (urls)"""
+    model_name = request.form.get('model') or MODEL_NAME
+    if model_name not in AVAILABLE_MODELS:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown model '{model_name}'. Available models: {', '.join(AVAILABLE_MODELS)}"
+        }), 400
+    try:
+        priority = int(request.form.get('priority', 0))
+    except ValueError:
+        return jsonify({"success": False, "error": "priority must be an integer"}), 400
+    
+    # Expand playlists and channels into their videos, one metadata request each
+    try:
+        videos = []
+        urls = request.form.get('urls', '').replace(',', ' ').split()
+        for url in urls:
+            video_id = extract_video_id(url)
+            if video_id and 'list=' not in url:
+                videos.append({'url': url, 'video_id': video_id, 'title': None})
+            else:
+                videos.extend(expand_playlist(url, BATCH_MAX_VIDEOS))
+        if request.form.get('url'):
+            videos.extend(expand_playlist(request.form['url'], BATCH_MAX_VIDEOS))
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Error reading playlist: {str(e)}"}), 400
+    
+    unique = {}
+    for video in videos:
+        unique.setdefault(video['video_id'], video)
+    videos = list(unique.values())[:BATCH_MAX_VIDEOS]
+    if not videos:
+        return jsonify({"success": False, "error": "No videos found"}), 400
+    
+    entries = []
+    for video in videos:
+        task_id = str(uuid.uuid4())
+        cached = transcript_cache.get(cache_key(video['video_id'], model_name))
+        metrics.cache_requests.inc(result='hit' if cached else 'miss')
+        if cached:
+            restore_transcript(cached)
+            tasks[task_id] = {'state': 'SUCCESS', 'result': cached}
+        elif DISTRIBUTED or (video['video_id'], model_name) in inflight:
+            # Nothing to download here; the workers or the running job do it
+            try:
+                submit_job(task_id, video['url'], video['video_id'], model_name, priority=priority)
+            except QueueFull:
+                tasks[task_id] = {'state': 'FAILURE', 'status': 'The server is busy. Please try again in a few minutes.'}
+        else:
+            # Download on the download pool so transcription workers never wait on the network
+            tasks[task_id] = {'state': 'PENDING', 'status': 'Waiting for download...', 'model': model_name}
+            download_pool.submit(prefetch_audio, task_id, video['url'], video['video_id'], model_name, priority)
+        entries.append(dict(video, task_id=task_id))
+    
+    batch_id = str(uuid.uuid4())
+    batches[batch_id] = {'model': model_name, 'entries': entries}
+    return jsonify({
+        "success": True,
+        "batch_id": batch_id,
+        "videos": len(entries),
+        "message": f"Transcribing {len(entries)} videos. Please wait..."
+    })
+
+def batch_entries(batch):
+    """Pair each entry of a batch with its task state"""
+    for entry in batch['entries']:
+        yield entry, tasks.get(entry['task_id']) or {'state': 'FAILURE', 'status': 'Task expired'}
+
+@app.route('/batch/<batch_id>')
+def batch_status(batch_id):
+    batch = batches.get(batch_id)
+    if not batch:
+        return jsonify({'state': 'FAILURE', 'status': 'Batch not found'}), 404
+    
+    counts = {'PENDING': 0, 'PROGRESS': 0, 'SUCCESS': 0, 'FAILURE': 0}
+    progress = 0.0
+    videos = []
+    for entry, state in batch_entries(batch):
+        counts[state['state']] += 1
+        if state['state'] in ('SUCCESS', 'FAILURE'):
+            progress += 1
+        elif state['state'] == 'PROGRESS':
+            progress += state['status'].get('current', 0) / state['status'].get('total', 10)
+        videos.append({
+            'task_id': entry['task_id'],
+            'video_id': entry['video_id'],
+            'title': entry['title'] or (state.get('result') or {}).get('title'),
+            'state': state['state'],
+            'status': state.get('status') if state['state'] != 'SUCCESS' else 'Done'
+        })
+    
+    finished = counts['SUCCESS'] + counts['FAILURE'] == len(videos)
+    return jsonify({
+        'state': 'SUCCESS' if finished else 'PROGRESS',
+        'progress': round(progress / len(videos), 3),
+        'counts': counts,
+        'videos': videos
+    })
+
+@app.route('/batch/<batch_id>/download')
+def download_batch(batch_id):
+    """Zip the transcripts and subtitles of every finished video in a batch"""
+    batch = batches.get(batch_id)
+    if not batch:
+        return "Batch not found", 404
+    
+    bundle = io.BytesIO()
+    summary = []
+    with zipfile.ZipFile(bundle, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for entry, state in batch_entries(batch):
+            video_id = entry['video_id']
+            summary.append({'video_id': video_id, 'url': entry['url'], 'state': state['state']})
+            if state['state'] != 'SUCCESS':
+                continue
+            txt = artifact_store.get(video_id, 'txt')
+            if txt:
+                archive.write(txt['path'], f"{video_id}.txt")
+            npz = artifact_store.get(video_id, 'npz')
+            if npz:
+                archive.writestr(f"{video_id}.srt", Transcript.load(npz['path']).to_srt())
+        archive.writestr('batch.json', json.dumps(summary, indent=2))
+    
+    bundle.seek(0)
+    return send_file(bundle, mimetype='application/zip', as_attachment=True, download_name=f"batch_{batch_id}.zip")
+
 @app.route('/status/<task_id>')
 def task_status(task_id):
-    if task_id in tasks:
-        return jsonify(tasks[task_id])
+    state = tasks.get(task_id)
+    if state:
+        if state['state'] == 'PENDING':
+            position = scheduler.position(job_of.get(task_id))
+            if position is not None:
+                eta = predicted_seconds(position, state.get('model', MODEL_NAME))
+                state = dict(
+                    state,
+                    queue_position=position,
+                    status=f'Waiting in queue (position {position})...',
+                    eta_seconds=round(eta),
+                    completes_at=time.time() + eta
+                )
+        elif state['state'] == 'PROGRESS' and 'completes_at' in state['status']:
+            # Count down from the estimate made at the last progress update
+            status = state['status']
+            state = dict(state, status=dict(status, eta_seconds=max(round(status['completes_at'] - time.time()), 0)))
+        return jsonify(state)
     else:
         return jsonify({
             'state': 'FAILURE',
             'status': 'Task not found'
         })
 
+@app.route('/stream/<task_id>')
+def stream_task(task_id):
+    with jobs_lock:
+        job_id = job_of.get(task_id)
+    log = event_hub.get(job_id) if job_id else None
+    
+    # Resume after the last event the client received when it reconnects
+    try:
+        since = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        since = 0
+    
+    def generate():
+        # Start with the current state, which is the final one if the job is already done
+        yield format_sse('state', tasks.get(task_id, {'state': 'FAILURE', 'status': 'Task not found'}))
+        if log is None:
+            return
+        for item in log.follow(since):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            index, event, data = item
+            yield format_sse(event, data, event_id=index)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/cancel/<task_id>', methods=['POST'])
+def cancel_task(task_id):
+    with jobs_lock:
+        job_id = job_of.get(task_id)
+        if not job_id:
+            return jsonify({"success": False, "error": "Task not found or already finished"}), 404
+        
+        # Other requests still want this job, so only detach this one
+        if len(subscribers[job_id]) > 1:
+            subscribers[job_id].remove(task_id)
+            del job_of[task_id]
+            tasks.unpin(task_id)
+            tasks[task_id] = {'state': 'FAILURE', 'status': 'Cancelled'}
+            return jsonify({"success": True, "task_id": task_id})
+        
+        # Cancel and forget the job without letting go of the lock, so no request can attach to it in between
+        if not scheduler.cancel(job_id):
+            return jsonify({"success": False, "error": "Task has already started and cannot be cancelled"}), 409
+        tasks[task_id] = {'state': 'FAILURE', 'status': 'Cancelled'}
+        key = next((key for key, jid in inflight.items() if jid == job_id), None)
+        forget_job(job_id, key)
+    
+    event_hub.publish(job_id, 'state', tasks[task_id])
+    event_hub.close(job_id)
+    return jsonify({"success": True, "task_id": task_id})
+
+def send_artifact(entry, download_name, etag=None, content=None):
+    """Send an artifact with its ETag, answering range and conditional requests
+
+    Files are streamed with the server's file wrapper (sendfile where
+    available); content, if given, is sent instead of the file itself.
+    """
+    etag = etag or entry['etag']
+    response = send_file(
+        io.BytesIO(content) if content is not None else entry['path'],
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=etag,
+        last_modified=entry['mtime']
+    )
+    # Let clients keep a copy but check the ETag before reusing it
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified(etag):
+    """Answer If-None-Match for an ETag before doing any work to produce the body"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
 @app.route('/download/<video_id>/<format>')
 def download_file(video_id, format):
-    if format == 'txt':
-        file_path = f"downloads/{video_id}.txt"
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-    
-    elif format == 'mp3':
-        # Check if the MP3 file exists
-        file_path = f"downloads/{video_id}_audio.mp3"
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        
-        # If MP3 doesn't exist, check if we have the original audio file
-        if video_id in video_info and 'original_audio_file' in video_info[video_id]:
-            original_file = video_info[video_id]['original_audio_file']
-            if os.path.exists(original_file):
-                return send_file(original_file, as_attachment=True, download_name=f"{video_id}_audio.mp3")
-    
-    elif format == 'mp4':
-        # Check if the MP4 file exists
-        file_path = f"downloads/{video_id}_video.mp4"
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
-        
-        # If MP4 doesn't exist, check if we have the original video file
-        if video_id in video_info and 'original_video_file' in video_info[video_id]:
-            original_file = video_info[video_id]['original_video_file']
-            if os.path.exists(original_file):
-                return send_file(original_file, as_attachment=True, download_name=f"{video_id}_video.mp4")
+    if format in TRANSCRIPT_FORMATS:
+        # Generated from the stored segment and word timings, without running inference again
+        entry = artifact_store.get(video_id, 'npz')
+        if entry:
+            etag = f"{entry['etag']}-{format}"
+            artifact_store.touch(video_id, 'npz')
+            response = not_modified(etag)
+            if response:
+                return response
+            mimetype, render = TRANSCRIPT_FORMATS[format]
+            info = video_info.get(video_id) or {}
+            try:
+                content = render(Transcript.load(entry['path']), {
+                    'video_id': video_id,
+                    'title': info.get('title'),
+                    'url': info.get('url')
+                })
+            except FileNotFoundError:
+                artifact_store.forget(video_id, 'npz')
+                return "File not found", 404
+            response = send_artifact(entry, f"{video_id}.{format}", etag=etag, content=content.encode('utf-8'))
+            response.mimetype = mimetype
+            return response
+    
+    elif format == 'txt' or format in ARTIFACT_BUILDERS:
+        entry = artifact_store.get(video_id, format)
+        if entry:
+            download_name = {
+                'txt': f"{video_id}.txt",
+                'mp3': f"{video_id}_audio.mp3",
+                'mp4': f"{video_id}_video.mp4",
+            }[format]
+            try:
+                artifact_store.touch(video_id, format)
+                return send_artifact(entry, download_name)
+            except FileNotFoundError:
+                # Removed behind the index's back; build it again below
+                artifact_store.forget(video_id, format)
+                transcode_queue.forget(video_id, format)
+        
+        # Otherwise produce it in the background and let the client poll
+        if format in ARTIFACT_BUILDERS and video_id in video_info:
+            # A build that succeeded before but whose file is gone (e.g. evicted) is built again
+            if (transcode_queue.status(video_id, format) or {}).get('state') == 'SUCCESS':
+                transcode_queue.forget(video_id, format)
+            job = request_artifact(video_id, format, retry=request.args.get('retry') == '1')
+            if job['state'] == 'FAILURE':
+                # Shown by the page; ask again with retry=1 to build it again right away
+                return jsonify(dict(job, success=False, error=f"Could not prepare {format.upper()}: {job['status']}")), 500
+            return jsonify(job), 202
     
     return "File not found", 404
 
+@app.route('/search')
+def search_transcripts():
+    """Find the moments in finished transcripts where every word of q is spoken"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"success": False, "error": "Missing search query (q)"}), 400
+    # SQLite reads a negative LIMIT as no limit at all
+    limit = max(1, min(request.args.get('limit', 20, type=int), SEARCH_MAX_RESULTS))
+    
+    start = time.perf_counter()
+    results = search_index.search(query, limit=limit, video_id=request.args.get('video_id'))
+    return jsonify({
+        "success": True,
+        "query": query,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Pipeline stage timings, queue and cache statistics in the Prometheus text format"""
+    with jobs_lock:
+        running = len(inflight)
+    loaded = pipeline.models.loaded() if pipeline.models else []
+    hits = metrics.cache_requests.get(result='hit')
+    lookups = hits + metrics.cache_requests.get(result='miss')
+    body = metrics.render(
+        metrics.gauge('transcriber_queue_depth', 'Jobs waiting for a transcription worker', {(): scheduler.queue_depth()}),
+        metrics.gauge('transcriber_active_jobs', 'Jobs being transcribed', {(): scheduler.active_jobs()}),
+        metrics.gauge('transcriber_inflight_jobs', 'Jobs queued or running', {(): running}),
+        metrics.gauge(
+            'transcriber_model_loaded',
+            'Whether a Whisper model is loaded in this process',
+            {(('model', name),): int(name in loaded) for name in pipeline.AVAILABLE_MODELS}
+        ),
+        metrics.gauge('transcriber_cache_hit_ratio', 'Share of transcript cache lookups that hit', {(): hits / lookups if lookups else 0}),
+        metrics.gauge('transcriber_artifact_bytes', 'Size of the files ready for download', {(): artifact_store.size()})
+    )
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+# Inference worker processes (INFERENCE_BACKEND=process) are spawned and import this module
+# again as __mp_main__ when the app is started with `python app.py`. Only the web process
+# starts the app's workers, touches the downloads and cache directories and loads models.
+if __name__ != '__mp_main__':
+    if not DISTRIBUTED:
+        # Models load in the background so the server accepts connections right away
+        init_inference()
+    
+    # MP3/MP4 downloads are only produced when asked for, on background transcoding workers
+    transcode_queue = TranscodeQueue(
+        workers=int(os.environ.get("TRANSCODE_WORKERS", "1")),
+        retry_after=int(os.environ.get("TRANSCODE_RETRY_SECONDS", "300"))
+    )
+    
+    # Index the files already downloaded, reclaim partial ones and evict down to the budget
+    artifact_store.scan()
+    
+    # Fixed pool of transcription workers fed from a bounded priority queue
+    scheduler = JobScheduler(
+        workers=int(os.environ.get("TRANSCRIBE_WORKERS", "0")) or default_worker_count(),
+        max_queue=int(os.environ.get("TRANSCRIBE_MAX_QUEUE", "50"))
+    )
+    
+    # Audio downloads that feed batches
+    download_pool = DownloadPool(
+        workers=int(os.environ.get("DOWNLOAD_WORKERS", "4")),
+        options=audio_download_options()
+    )
+    
+    # Finished transcriptions, kept on disk across restarts
+    transcript_cache = TranscriptCache(
+        os.environ.get("TRANSCRIPT_CACHE_DIR", "cache"),
+        max_bytes=int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "512")) * 1024 * 1024,
+        max_age=int(os.environ.get("TRANSCRIPT_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+    )
+    
+    # Full-text index of every finished transcript, searched by /search; transcripts
+    # saved before it existed are indexed in the background so startup is not delayed
+    search_index = TranscriptIndex(os.environ.get("SEARCH_INDEX_PATH", "search.db"))
+    threading.Thread(target=index_saved_transcripts, daemon=True).start()
+
 if __name__ == '__main__':
     # Ensure downloads directory exists
     os.makedirs("downloads", exist_ok=True)
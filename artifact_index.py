@@ -0,0 +1,215 @@
+import hashlib
+import os
+import threading
+import time
+
+# File name of each artifact kind in a video's shard of the downloads directory
+ARTIFACT_NAMES = {
+    'txt': '{video_id}.txt',
+    'npz': '{video_id}.npz',
+    'mp3': '{video_id}_audio.mp3',
+    'mp4': '{video_id}_video.mp4',
+}
+
+# Downloaded originals kept until evicted, e.g. the webm/m4a audio a transcript was made from
+SOURCE_PREFIXES = {
+    'audio': '_audio.',
+    'video': '_video.',
+}
+
+# Files left behind by downloads, transcodes and saves that were interrupted
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.tmp', '.temp')
+
+# Length of YouTube video IDs, which start every artifact file name
+VIDEO_ID_LENGTH = 11
+
+
+def shard_dir(directory, video_id):
+    """Subdirectory holding a video's files, named after the first two characters of its ID
+
+    Matches the '%(id).2s' field of yt-dlp output templates.
+    """
+    return os.path.join(directory, video_id[:2])
+
+
+def is_partial(name):
+    return name.endswith(PARTIAL_SUFFIXES) or '.part-Frag' in name
+
+
+def _kind(name):
+    """Return the video ID and artifact kind of a file name, or None if it is not an artifact"""
+    video_id, rest = name[:VIDEO_ID_LENGTH], name[VIDEO_ID_LENGTH:]
+    if len(video_id) < VIDEO_ID_LENGTH:
+        return None
+    for kind, pattern in ARTIFACT_NAMES.items():
+        if rest == pattern.format(video_id=''):
+            return video_id, kind
+    for kind, prefix in SOURCE_PREFIXES.items():
+        if rest.startswith(prefix):
+            return video_id, kind
+    return None
+
+
+def _entry(path):
+    stat = os.stat(path)
+    # Strong validator: changes whenever the file is replaced or rewritten
+    tag = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return {
+        'path': path,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'atime': stat.st_atime,
+        'etag': hashlib.sha1(tag.encode('utf-8')).hexdigest()[:20],
+    }
+
+
+class ArtifactIndex:
+    """Disk-budgeted store of the files ready for download, with their size, mtime and ETag
+
+    Downloads look artifacts up here instead of probing the filesystem. An
+    artifact that is not indexed yet (e.g. produced by another process) is
+    looked for once at its usual path and indexed if found.
+
+    Files live in one subdirectory per two-character video ID prefix. Once
+    the indexed files exceed max_bytes, the least recently downloaded ones
+    are deleted, except those of pinned videos (jobs and transcodes still
+    working on them). Access times are written to the files' atime, leaving
+    the mtime and so the ETag alone, so the order survives restarts. Pins
+    only protect files from eviction by this process.
+    """
+
+    def __init__(self, directory, max_bytes=None, stale_after=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stale_after = stale_after
+        self.entries = {}
+        self.pins = {}
+        self.lock = threading.Lock()
+
+    def path(self, video_id, kind):
+        """Usual path of an artifact"""
+        return os.path.join(shard_dir(self.directory, video_id), ARTIFACT_NAMES[kind].format(video_id=video_id))
+
+    def scan(self):
+        """Index every artifact already in the directory and reclaim stale partial files
+
+        Files from before the sharded layout are moved into their shard.
+        Partial files are only removed once they have not been written to for
+        stale_after seconds, so downloads still running in another process
+        are left alone.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        for root, dirs, names in os.walk(self.directory):
+            # The top level and the shards, nothing deeper
+            if root != self.directory:
+                dirs[:] = []
+            for name in names:
+                path = os.path.join(root, name)
+                if is_partial(name):
+                    try:
+                        if now - os.path.getmtime(path) > self.stale_after:
+                            os.remove(path)
+                            print(f"Removed stale partial file: {path}")
+                    except OSError:
+                        pass
+                    continue
+
+                artifact = _kind(name)
+                if artifact is None:
+                    continue
+                video_id, kind = artifact
+                try:
+                    if root == self.directory:
+                        os.makedirs(shard_dir(self.directory, video_id), exist_ok=True)
+                        moved = os.path.join(shard_dir(self.directory, video_id), name)
+                        os.replace(path, moved)
+                        path = moved
+                    self.add(video_id, kind, path, evict=False)
+                except OSError as e:
+                    print(f"Error indexing {path}: {str(e)}")
+        self.evict()
+
+    def add(self, video_id, kind, path, evict=True):
+        """Index a finished artifact, evict others if over budget and return its entry"""
+        entry = _entry(path)
+        with self.lock:
+            # A file serves as one kind only, e.g. original audio sent as the MP3
+            for key in [key for key, other in self.entries.items() if key[0] == video_id and other['path'] == path]:
+                del self.entries[key]
+            self.entries[(video_id, kind)] = entry
+        if evict:
+            self.evict()
+        return entry
+
+    def get(self, video_id, kind):
+        """Return the entry of an artifact, or None if there is none"""
+        with self.lock:
+            entry = self.entries.get((video_id, kind))
+        if entry is not None or kind not in ARTIFACT_NAMES:
+            return entry
+        try:
+            return self.add(video_id, kind, self.path(video_id, kind))
+        except OSError:
+            return None
+
+    def touch(self, video_id, kind):
+        """Record that an artifact was just downloaded"""
+        with self.lock:
+            entry = self.entries.get((video_id, kind))
+            if entry is None:
+                return
+            entry['atime'] = time.time()
+        try:
+            os.utime(entry['path'], (entry['atime'], entry['mtime']))
+        except OSError:
+            pass
+
+    def videos(self, kind):
+        """IDs of the videos with an indexed artifact of a kind"""
+        with self.lock:
+            return [video_id for video_id, other in self.entries if other == kind]
+
+    def forget(self, video_id, kind):
+        with self.lock:
+            self.entries.pop((video_id, kind), None)
+
+    def pin(self, video_id):
+        """Keep a video's files from being evicted until unpin() is called as many times"""
+        with self.lock:
+            self.pins[video_id] = self.pins.get(video_id, 0) + 1
+
+    def unpin(self, video_id):
+        with self.lock:
+            if self.pins.get(video_id, 0) > 1:
+                self.pins[video_id] -= 1
+            else:
+                self.pins.pop(video_id, None)
+
+    def size(self):
+        with self.lock:
+            return sum(entry['size'] for entry in self.entries.values())
+
+    def evict(self):
+        """Remove least recently downloaded artifacts of unpinned videos until under the budget"""
+        if self.max_bytes is None:
+            return
+        with self.lock:
+            total = sum(entry['size'] for entry in self.entries.values())
+            for key, entry in sorted(self.entries.items(), key=lambda item: item[1]['atime']):
+                if total <= self.max_bytes:
+                    break
+                if key[0] in self.pins:
+                    continue
+                try:
+                    os.remove(entry['path'])
+                    print(f"Evicted artifact: {entry['path']}")
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    # Still open elsewhere (e.g. on Windows); try again on the next eviction
+                    print(f"Error evicting artifact {entry['path']}: {str(e)}")
+                    continue
+                del self.entries[key]
+                total -= entry['size']
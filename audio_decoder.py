@@ -0,0 +1,127 @@
+import subprocess
+import threading
+
+import numpy as np
+from whisper.audio import SAMPLE_RATE
+
+READ_SIZE = 1024 * 1024  # bytes read from ffmpeg per pipe read
+
+
+def probe_duration(input_file):
+    """Return the duration of a media file in seconds using ffprobe, or None if unknown"""
+    cmd = [
+        '.\\ffprobe.exe',
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        input_file
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _ffmpeg_pcm_command(input_file, input_args=()):
+    """FFmpeg command that decodes any input (a file or a URL) to 16 kHz mono s16le on stdout"""
+    return [
+        '.\\ffmpeg.exe',
+        '-nostdin',
+        '-loglevel', 'error',
+        '-threads', '0',
+        *input_args,
+        '-i', input_file,
+        '-f', 's16le',
+        '-ac', '1',
+        '-acodec', 'pcm_s16le',
+        '-ar', str(SAMPLE_RATE),
+        '-'
+    ]
+
+
+def iter_pcm_blocks(input_file, read_size=READ_SIZE, input_args=()):
+    """Decode a media file with a single ffmpeg process and yield float32 sample blocks as they arrive
+
+    Raises RuntimeError if ffmpeg fails. Closing the generator early stops
+    ffmpeg without raising.
+    """
+    process = subprocess.Popen(
+        _ffmpeg_pcm_command(input_file, input_args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    # Drain stderr in the background so ffmpeg never blocks on a full pipe
+    errors = []
+    stderr_thread = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    leftover = b''
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(read_size)
+            if not data:
+                finished = True
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            yield np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        if not finished:
+            # Stopped early by the consumer; ffmpeg would only fail writing to the closed pipe
+            process.kill()
+        returncode = process.wait()
+        stderr_thread.join()
+        process.stderr.close()
+        if finished and returncode != 0:
+            stderr = b''.join(errors).decode("utf-8", errors="replace")
+            raise RuntimeError(f"Failed to decode audio: {stderr}")
+
+
+def iter_audio_chunks(input_file, chunk_samples, input_args=()):
+    """Yield consecutive float32 chunks of chunk_samples samples (the last one may be shorter)
+
+    input_file may also be a stream URL, in which case chunks are produced
+    while the stream is still downloading.
+    """
+    buffer = np.empty(chunk_samples, dtype=np.float32)
+    filled = 0
+    for block in iter_pcm_blocks(input_file, input_args=input_args):
+        while len(block):
+            take = min(chunk_samples - filled, len(block))
+            buffer[filled:filled+take] = block[:take]
+            filled += take
+            block = block[take:]
+            if filled == chunk_samples:
+                yield buffer.copy()
+                filled = 0
+    if filled:
+        yield buffer[:filled].copy()
+
+
+def decode_audio(input_file):
+    """Decode a media file straight into a float32 numpy array, like whisper.load_audio
+
+    Samples are streamed from ffmpeg's stdout into a buffer preallocated from
+    the probed duration, so no intermediate WAV file is written and the raw
+    PCM bytes are never held in memory all at once.
+    """
+    duration = probe_duration(input_file)
+    capacity = int((duration or 60) * SAMPLE_RATE) + SAMPLE_RATE
+    audio = np.empty(capacity, dtype=np.float32)
+    n_samples = 0
+
+    for block in iter_pcm_blocks(input_file):
+        if n_samples + len(block) > len(audio):
+            # The probe was short or unavailable; grow geometrically
+            grown = np.empty(max(2 * len(audio), n_samples + len(block)), dtype=np.float32)
+            grown[:n_samples] = audio[:n_samples]
+            audio = grown
+        audio[n_samples:n_samples+len(block)] = block
+        n_samples += len(block)
+
+    return audio[:n_samples]
@@ -0,0 +1,246 @@
+import numpy as np
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, N_FFT, N_FRAMES, N_SAMPLES, SAMPLE_RATE, mel_filters
+from whisper.timing import add_word_timestamps
+from whisper.tokenizer import get_tokenizer
+
+# Same thresholds model.transcribe() uses by default
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# Text decoded above this temperature is not used as a prompt, as in model.transcribe()
+PROMPT_RESET_TEMPERATURE = 0.5
+
+TIME_PRECISION = 2 * HOP_LENGTH / SAMPLE_RATE  # seconds per timestamp token
+
+
+def log_mel_batch(chunks, n_mels, device):
+    """Compute log-mel spectrograms for several audio chunks as one stacked tensor
+
+    Each row is normalised on its own, exactly like model.transcribe() does for a
+    single chunk, so the batched path sees the same input as the serial one.
+    """
+    audio = np.zeros((len(chunks), 2 * N_SAMPLES), dtype=np.float32)
+    content_frames = []
+    for row, chunk in enumerate(chunks):
+        audio[row, :len(chunk)] = chunk
+        content_frames.append(min(len(chunk) // HOP_LENGTH, N_FRAMES))
+
+    audio = torch.from_numpy(audio).to(device)
+    window = torch.hann_window(N_FFT).to(device)
+    stft = torch.stft(audio, N_FFT, HOP_LENGTH, window=window, return_complex=True)
+    magnitudes = stft[..., :-1].abs() ** 2
+
+    mel_spec = mel_filters(device, n_mels) @ magnitudes
+    log_spec = torch.clamp(mel_spec, min=1e-10).log10()
+    log_spec = torch.maximum(log_spec, log_spec.amax(dim=(-2, -1), keepdim=True) - 8.0)
+    log_spec = (log_spec + 4.0) / 4.0
+
+    # Keep only the real content of each chunk and zero-pad the rest of the window
+    mel = torch.zeros((len(chunks), n_mels, N_FRAMES), dtype=log_spec.dtype, device=device)
+    for row, frames in enumerate(content_frames):
+        mel[row, :, :frames] = log_spec[row, :, :frames]
+
+    return mel, content_frames
+
+
+def detect_language(model, chunk):
+    """Detect the spoken language of a chunk of up to 30 s, like model.transcribe() does on its first window
+
+    model.transcribe() detects on the log-mel of the audio padded with 30 s
+    of silence, not on zero-padded frames as the batch is decoded from, so
+    the mel is built the same way here.
+    """
+    if not model.is_multilingual:
+        return "en"
+    mel = whisper.log_mel_spectrogram(chunk, model.dims.n_mels, padding=N_SAMPLES)
+    mel = whisper.pad_or_trim(mel, N_FRAMES).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def _consumed_tokens(tokens, tokenizer, content_frames):
+    """Return the tokens model.transcribe() would keep for a window, or None if it would seek further"""
+    tokens = torch.tensor(tokens)
+    timestamp_tokens = tokens.ge(tokenizer.timestamp_begin)
+    single_timestamp_ending = timestamp_tokens[-2:].tolist() == [False, True]
+    consecutive = torch.where(timestamp_tokens[:-1] & timestamp_tokens[1:])[0]
+    consecutive.add_(1)
+
+    if len(consecutive) == 0 or single_timestamp_ending:
+        return tokens.tolist()
+
+    last_slice = consecutive[-1].item()
+    last_timestamp_pos = tokens[last_slice - 1].item() - tokenizer.timestamp_begin
+    if last_timestamp_pos * 2 < content_frames:
+        # The serial path would decode another window inside this chunk
+        return None
+
+    return tokens[:last_slice].tolist()
+
+
+def _token_segments(tokens, tokenizer, duration):
+    """Split a window's tokens into segments at its timestamp tokens, timed from the start of the chunk"""
+    segments = []
+    start = 0.0
+    text_tokens = []
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            time = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if text_tokens:
+                segments.append({"seek": 0, "start": start, "end": time, "tokens": text_tokens})
+                text_tokens = []
+            start = time
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+    if text_tokens:
+        segments.append({"seek": 0, "start": start, "end": duration, "tokens": text_tokens})
+
+    for segment in segments:
+        segment["text"] = tokenizer.decode(segment["tokens"])
+    return segments
+
+
+def _timed_segments(segments):
+    """Keep only the timing fields of decoded segments"""
+    return [
+        {
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": segment["text"].strip(),
+            "words": [
+                {"start": word["start"], "end": word["end"], "word": word["word"], "probability": word["probability"]}
+                for word in segment.get("words", [])
+            ],
+        }
+        for segment in segments
+    ]
+
+
+def _serial_prompt(segments):
+    """Tokens model.transcribe() would condition its next window on after these segments
+
+    Returns [] if the last window was decoded at a high fallback
+    temperature with nothing after it, and None if nothing was decoded.
+    """
+    tokens = None
+    for segment in segments:
+        if segment.get("temperature", 0.0) > PROMPT_RESET_TEMPERATURE:
+            tokens = []
+        elif segment["tokens"]:
+            tokens = (tokens or []) + segment["tokens"]
+    return tokens
+
+
+def next_prompt(results, prompt):
+    """Prompt for the chunk after a batch: the text carried forward by its last chunks
+
+    Chunks with no text leave the prompt as it was, and a chunk that needed a
+    high-temperature fallback resets it, like model.transcribe() does.
+    """
+    for result in results:
+        if result["prompt"] is not None:
+            prompt = result["prompt"] or None
+    return prompt
+
+
+def transcribe_batch(model, chunks, language=None, task="transcribe", prompt=None, word_timestamps=False):
+    """Transcribe up to 30 s chunks in one batch
+
+    Returns one dict per chunk with the same "text" and "language" that
+    model.transcribe(chunk, fp16=False, ...) would give, plus the decoded
+    "tokens". Chunks that need a temperature fallback or more than one
+    decoding window go through the serial path so the output stays identical.
+
+    prompt is a list of tokens (usually the previous chunk's) that every
+    chunk in the batch is conditioned on; chunks decoded together in one
+    pass cannot be conditioned on each other. Each dict's "prompt" is what
+    the chunk carries forward for next_prompt(): its tokens, [] to reset the
+    prompt after a high-temperature fallback, or None to leave it as is.
+
+    Each dict also has "segments" with start and end times in seconds from
+    the start of the chunk and, with word_timestamps, the "words" in each.
+    """
+    results = [None] * len(chunks)
+    batch_rows = [i for i, chunk in enumerate(chunks) if 0 < len(chunk) <= N_SAMPLES]
+    serial_rows = [i for i in range(len(chunks)) if i not in batch_rows]
+
+    if batch_rows:
+        mel, content_frames = log_mel_batch([chunks[i] for i in batch_rows], model.dims.n_mels, model.device)
+        options = whisper.DecodingOptions(
+            task=task, language=language, temperature=0.0, prompt=prompt or None, fp16=False
+        )
+        decoded = whisper.decode(model, mel, options)
+
+        for index, (row, result, frames) in enumerate(zip(batch_rows, decoded, content_frames)):
+            should_skip = result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob <= LOGPROB_THRESHOLD
+            needs_fallback = (
+                result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                or result.avg_logprob < LOGPROB_THRESHOLD
+            )
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD:
+                needs_fallback = False
+
+            if should_skip:
+                results[row] = {"text": "", "language": result.language, "tokens": [], "prompt": None, "segments": []}
+                continue
+            if needs_fallback:
+                serial_rows.append(row)
+                continue
+
+            tokenizer = get_tokenizer(
+                model.is_multilingual,
+                num_languages=model.num_languages,
+                language=result.language,
+                task=task,
+            )
+            tokens = _consumed_tokens(result.tokens, tokenizer, frames)
+            if tokens is None:
+                serial_rows.append(row)
+                continue
+
+            segments = _token_segments(tokens, tokenizer, len(chunks[row]) / SAMPLE_RATE)
+            if word_timestamps:
+                add_word_timestamps(
+                    segments=segments,
+                    model=model,
+                    tokenizer=tokenizer,
+                    mel=mel[index],
+                    num_frames=frames,
+                    last_speech_timestamp=0.0
+                )
+            results[row] = {
+                "text": tokenizer.decode(tokens),
+                "language": result.language,
+                "tokens": tokens,
+                "prompt": tokens or None,
+                "segments": _timed_segments(segments),
+            }
+
+    # model.transcribe() only takes a text prompt
+    initial_prompt = None
+    if serial_rows and prompt:
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, task=task)
+        initial_prompt = tokenizer.decode([token for token in prompt if token < tokenizer.eot])
+
+    for row in sorted(serial_rows):
+        result = model.transcribe(
+            chunks[row],
+            fp16=False,
+            language=language,
+            task=task,
+            initial_prompt=initial_prompt,
+            word_timestamps=word_timestamps,
+            verbose=False
+        )
+        results[row] = {
+            "text": result["text"],
+            "language": result["language"],
+            "tokens": [token for segment in result["segments"] for token in segment["tokens"]],
+            "prompt": _serial_prompt(result["segments"]),
+            "segments": _timed_segments(result["segments"]),
+        }
+
+    return results
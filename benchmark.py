@@ -0,0 +1,276 @@
+"""Benchmark the decode -> segment -> transcribe pipeline on local audio files
+
+Runs offline on CPU: downloads are replaced by the local fixture, so only
+decoding, segmentation and inference are measured. Example:
+
+    python benchmark.py --audio test_audio.mp3 --concurrency 1,2,4 --output benchmark.json
+
+With --compare-quantized, each file is also transcribed with the float32
+and the int8 model to compare their speed and output.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+
+import torch
+import whisper
+from whisper.audio import SAMPLE_RATE
+
+import pipeline
+from audio_decoder import decode_audio
+from inference import ThreadBackend, load_model
+from segmentation import speech_segments
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far in MB, or None if unavailable
+
+    The peak never goes down, so measurements that must not include earlier
+    work run in a process of their own (see concurrency_in_subprocess).
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return round(peak / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(func, *args, **kwargs):
+    """Call func and return (result, wall seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance between two texts, divided by the length of the reference"""
+    reference = reference.lower().split()
+    hypothesis = hypothesis.lower().split()
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(reference) if reference else float(bool(hypothesis))
+
+
+def stub_downloads(audio_file):
+    """Make pipeline.transcribe_video read audio_file instead of downloading with yt-dlp"""
+    def download_audio(url, video_id, report=None):
+        pipeline.video_info[video_id] = {
+            'title': os.path.basename(audio_file),
+            'url': url,
+            'duration': None,
+            'original_audio_file': audio_file
+        }
+        return audio_file, os.path.basename(audio_file)
+
+    pipeline.download_audio = download_audio
+    pipeline.PIPELINED = False
+
+
+def benchmark_stages(audio_file, model_name, batch_size):
+    """Time each pipeline stage once on one file"""
+    stages = {}
+
+    _, stages['load_audio'] = timed(whisper.load_audio, audio_file)
+    audio, stages['decode_audio'] = timed(decode_audio, audio_file)
+    duration = len(audio) / SAMPLE_RATE
+    segments, stages['segment'] = timed(speech_segments, audio, max_duration=30)
+
+    registry = pipeline.init_inference()
+    _, stages['model_load'] = timed(registry.get, model_name)
+
+    batch_times = []
+    with registry.acquire(model_name) as backend:
+        start = time.perf_counter()
+        for _ in backend.transcribe_batches(audio, segments, batch_size):
+            now = time.perf_counter()
+            batch_times.append(now - start)
+            start = now
+    stages['transcribe'] = sum(batch_times)
+
+    return {
+        'file': audio_file,
+        'audio_seconds': round(duration, 2),
+        'speech_seconds': round(sum(end - start for start, end in segments) / SAMPLE_RATE, 2),
+        'segments': len(segments),
+        'stages': {name: round(seconds, 4) for name, seconds in stages.items()},
+        'batch_seconds': [round(seconds, 4) for seconds in batch_times],
+        'rtf': round(stages['transcribe'] / duration, 4) if duration else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare_quantization(audio_file, model_name, batch_size):
+    """Transcribe one file with the float32 and the int8 model and compare speed and output
+
+    The word error rate of the int8 transcript is measured against the
+    float32 one, so it shows what quantization changes rather than the
+    absolute accuracy.
+    """
+    audio = decode_audio(audio_file)
+    duration = len(audio) / SAMPLE_RATE
+    segments = speech_segments(audio, max_duration=30)
+
+    runs = {}
+    for label, quantize in (('float32', False), ('int8', True)):
+        backend = ThreadBackend(load_model(model_name, quantize=quantize))
+        start = time.perf_counter()
+        text = " ".join(
+            result["text"].strip()
+            for results in backend.transcribe_batches(audio, segments, batch_size)
+            for result in results
+        )
+        seconds = time.perf_counter() - start
+        backend.close()
+        runs[label] = {
+            'transcribe_seconds': round(seconds, 4),
+            'rtf': round(seconds / duration, 4) if duration else None,
+            'text': text,
+        }
+
+    return {
+        **runs,
+        'speedup': round(runs['float32']['transcribe_seconds'] / runs['int8']['transcribe_seconds'], 3),
+        'wer_vs_float32': round(word_error_rate(runs['float32']['text'], runs['int8']['text']), 4),
+    }
+
+
+def benchmark_concurrency(audio_file, model_name, concurrency, duration):
+    """Run concurrent end-to-end jobs on one file and measure throughput"""
+    failures = []
+    lock = threading.Lock()
+
+    def run(i):
+        def report(state):
+            if state['state'] == 'FAILURE':
+                with lock:
+                    failures.append(state['status'])
+
+        _, seconds = timed(
+            pipeline.transcribe_video,
+            f"https://www.youtube.com/watch?v=bench{i:06d}",
+            report,
+            model_name=model_name
+        )
+        return seconds
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = sorted(executor.map(run, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    return {
+        'concurrency': concurrency,
+        'wall_seconds': round(wall, 3),
+        'latency_seconds': {
+            'min': round(latencies[0], 3),
+            'median': round(latencies[len(latencies) // 2], 3),
+            'max': round(latencies[-1], 3),
+        },
+        'audio_seconds_per_second': round(concurrency * duration / wall, 3),
+        'failures': failures,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _concurrency_worker(audio_file, model_name, batch_size, concurrency, duration):
+    pipeline.BATCH_SIZE = batch_size
+    stub_downloads(audio_file)
+    # Load the model up front so it is not part of the first job's latency
+    pipeline.init_inference().get(model_name)
+    return benchmark_concurrency(audio_file, model_name, concurrency, duration)
+
+
+def concurrency_in_subprocess(audio_file, model_name, batch_size, concurrency, duration):
+    """Run benchmark_concurrency in a fresh process, so its peak RSS covers only that level
+
+    The peak includes the loaded model, as it would in a server running that
+    many jobs.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(
+            _concurrency_worker, audio_file, model_name, batch_size, concurrency, duration
+        ).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--audio', nargs='+', default=['test_audio.mp3'], help='local audio files')
+    parser.add_argument('--model', default=pipeline.MODEL_NAME, help='Whisper model to use')
+    parser.add_argument('--batch-size', type=int, default=pipeline.BATCH_SIZE)
+    parser.add_argument('--concurrency', default='1,2,4', help='comma-separated concurrent job counts')
+    parser.add_argument('--output', default='benchmark.json', help='file the JSON results are written to')
+    parser.add_argument('--compare-quantized', action='store_true', help='compare float32 and int8 inference')
+    args = parser.parse_args()
+
+    pipeline.BATCH_SIZE = args.batch_size
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'model': args.model,
+        'batch_size': args.batch_size,
+        'inference_backend': pipeline.INFERENCE_BACKEND,
+        'quantize': 'int8' if pipeline.QUANTIZE else 'none',
+        'files': [],
+    }
+
+    for audio_file in args.audio:
+        print(f"Benchmarking {audio_file}...")
+        stages = benchmark_stages(audio_file, args.model, args.batch_size)
+        for name, seconds in stages['stages'].items():
+            print(f"  {name:<14} {seconds:8.3f}s")
+        print(f"  RTF {stages['rtf']}, peak RSS {stages['peak_rss_mb']} MB")
+
+        if args.compare_quantized:
+            comparison = compare_quantization(audio_file, args.model, args.batch_size)
+            print(f"  float32 RTF {comparison['float32']['rtf']}, int8 RTF {comparison['int8']['rtf']}, "
+                  f"speedup {comparison['speedup']}x, WER vs float32 {comparison['wer_vs_float32']}")
+            stages['quantization'] = comparison
+
+        stages['concurrency'] = []
+        for concurrency in [int(n) for n in args.concurrency.split(',')]:
+            run = concurrency_in_subprocess(
+                audio_file, args.model, args.batch_size, concurrency, stages['audio_seconds']
+            )
+            print(f"  {concurrency} concurrent: {run['audio_seconds_per_second']} audio s/s, "
+                  f"median latency {run['latency_seconds']['median']}s, peak RSS {run['peak_rss_mb']} MB")
+            stages['concurrency'].append(run)
+        results['files'].append(stages)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
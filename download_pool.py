@@ -0,0 +1,36 @@
+import queue
+import threading
+
+import yt_dlp
+
+
+class DownloadPool:
+    """Fixed number of download threads, each reusing one YoutubeDL instance
+
+    A YoutubeDL keeps state while it downloads, so an instance is never
+    shared between threads; each worker creates one when it starts and
+    uses it for every download it runs.
+    """
+
+    def __init__(self, workers, options):
+        self.options = options
+        self.queue = queue.Queue()
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"downloader-{i}", daemon=True)
+            thread.start()
+
+    def submit(self, func, *args):
+        """Run func(ydl, *args) on the next free download thread"""
+        self.queue.put((func, args))
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _worker(self):
+        ydl = yt_dlp.YoutubeDL(self.options)
+        while True:
+            func, args = self.queue.get()
+            try:
+                func(ydl, *args)
+            except Exception as e:
+                print(f"Error in download: {str(e)}")
@@ -0,0 +1,64 @@
+import threading
+
+
+class ThroughputModel:
+    """Running estimates of how fast this node downloads and transcribes
+
+    Each estimate is an exponentially weighted moving average of what was
+    observed, so it follows changes in load within a few jobs. Until
+    something has been observed the defaults are used.
+    """
+
+    def __init__(self, alpha=0.2, rtf=0.5, download_rate=1_000_000, audio_bitrate=16_000, job_duration=600):
+        self.alpha = alpha
+        self.default_rtf = rtf
+        self.rtfs = {}  # model name -> seconds of work per second of audio
+        self.download_rate = download_rate  # bytes per second
+        self.audio_bitrate = audio_bitrate  # bytes of downloaded audio per second of audio
+        self.job_duration = job_duration  # seconds of audio in a typical job
+        self.lock = threading.Lock()
+
+    def _blend(self, old, new):
+        return old + self.alpha * (new - old)
+
+    def observe_rtf(self, model, audio_seconds, wall_seconds):
+        """Record that transcribing audio_seconds of audio took wall_seconds"""
+        if audio_seconds <= 0:
+            return
+        with self.lock:
+            rtf = wall_seconds / audio_seconds
+            self.rtfs[model] = self._blend(self.rtfs.get(model, rtf), rtf)
+
+    def observe_download(self, speed=None, total_bytes=None, audio_seconds=None):
+        """Record a download speed in bytes per second and, once known, the size of the audio"""
+        with self.lock:
+            if speed:
+                self.download_rate = self._blend(self.download_rate, speed)
+            if total_bytes and audio_seconds:
+                self.audio_bitrate = self._blend(self.audio_bitrate, total_bytes / audio_seconds)
+
+    def observe_job(self, audio_seconds):
+        """Record the length of a finished job's audio"""
+        if audio_seconds:
+            with self.lock:
+                self.job_duration = self._blend(self.job_duration, audio_seconds)
+
+    def rtf(self, model):
+        with self.lock:
+            return self.rtfs.get(model, self.default_rtf)
+
+    def download_seconds(self, audio_seconds=None, remaining_bytes=None):
+        """Time to download the rest of a file, or a whole one of audio_seconds"""
+        with self.lock:
+            if remaining_bytes is None:
+                remaining_bytes = (audio_seconds or self.job_duration) * self.audio_bitrate
+            return remaining_bytes / self.download_rate
+
+    def transcription_seconds(self, model, audio_seconds):
+        return audio_seconds * self.rtf(model)
+
+    def job_seconds(self, model, audio_seconds=None):
+        """Time a whole job takes from download to transcript"""
+        with self.lock:
+            audio_seconds = audio_seconds or self.job_duration
+        return self.download_seconds(audio_seconds) + self.transcription_seconds(model, audio_seconds)
@@ -0,0 +1,79 @@
+import json
+import threading
+
+
+class EventLog:
+    """Append-only list of events for one job that any number of readers can follow"""
+
+    def __init__(self):
+        self.events = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def append(self, event, data):
+        with self.condition:
+            self.events.append((event, data))
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def follow(self, since=0, timeout=15):
+        """Yield (index, event, data) from index since onwards until the log is closed
+
+        Yields None whenever nothing happened for timeout seconds, so the
+        caller can send a keep-alive.
+        """
+        index = since
+        while True:
+            with self.condition:
+                if index >= len(self.events) and not self.closed:
+                    self.condition.wait(timeout)
+                pending = self.events[index:]
+                closed = self.closed
+
+            if not pending and not closed:
+                yield None
+            for event, data in pending:
+                yield index, event, data
+                index += 1
+            if closed and index >= len(self.events):
+                return
+
+
+class EventHub:
+    """Event logs of the jobs that are currently running, keyed by job ID"""
+
+    def __init__(self):
+        self.logs = {}
+        self.lock = threading.Lock()
+
+    def open(self, job_id):
+        with self.lock:
+            return self.logs.setdefault(job_id, EventLog())
+
+    def get(self, job_id):
+        with self.lock:
+            return self.logs.get(job_id)
+
+    def publish(self, job_id, event, data):
+        log = self.get(job_id)
+        if log:
+            log.append(event, data)
+
+    def close(self, job_id):
+        """Finish a job's log; readers already following it still get every event"""
+        with self.lock:
+            log = self.logs.pop(job_id, None)
+        if log:
+            log.close()
+
+
+def format_sse(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
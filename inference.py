@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from batch_decoder import detect_language, next_prompt, transcribe_batch
+
+# Model loaded once by each worker process
+_worker_model = None
+
+
+def load_model(model_name, quantize=False):
+    """Load a Whisper model, optionally with its linear layers quantized to int8 for CPU inference
+
+    Dynamic quantization stores the linear weights as int8 and quantizes
+    activations on the fly, which speeds up CPU inference at a small cost
+    in accuracy. Quantized models only run on the CPU.
+    """
+    import torch
+    import whisper
+
+    if not quantize:
+        return whisper.load_model(model_name)
+
+    model = whisper.load_model(model_name, device="cpu")
+    # Whisper's Linear subclass only adds dtype casting, which float32 inference
+    # does not need; quantize_dynamic only swaps out plain nn.Linear modules
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class ThreadBackend:
+    """Run inference in the calling thread with a model shared by the whole process"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe_batches(self, audio, segments, batch_size, language=None, task="transcribe", prompt=None, word_timestamps=False):
+        """Yield the results of each batch of segments, in order
+
+        Without a language, it is detected once on the first segment and
+        used for every batch. Every chunk of a batch is conditioned on the
+        text carried forward by the batch before it (see next_prompt()), the
+        first batch on prompt.
+        """
+        if segments and language is None:
+            start, end = segments[0]
+            language = detect_language(self.model, audio[start:end])
+        for i in range(0, len(segments), batch_size):
+            chunks = [audio[start:end] for start, end in segments[i:i+batch_size]]
+            results = transcribe_batch(
+                self.model, chunks, language=language, task=task, prompt=prompt, word_timestamps=word_timestamps
+            )
+            prompt = next_prompt(results, prompt)
+            yield results
+
+    def close(self):
+        """Drop the model so its memory can be freed"""
+        self.model = None
+
+
+def _init_worker(model_name, torch_threads, quantize):
+    """Load the Whisper model once when a worker process starts"""
+    global _worker_model
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = load_model(model_name, quantize=quantize)
+    print(f"Inference worker {os.getpid()} loaded model '{model_name}'{' (int8)' if quantize else ''}")
+
+
+def _detect_language(chunk):
+    """Detect the language of a chunk of audio"""
+    return detect_language(_worker_model, chunk)
+
+
+def _transcribe_shared(shm_name, n_samples, segments, language, task, prompt, word_timestamps):
+    """Transcribe segments of audio that the parent process put in shared memory"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # The parent owns the block; stop this process's tracker from unlinking it on exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        audio = np.ndarray((n_samples,), dtype=np.float32, buffer=shm.buf)
+        chunks = [np.array(audio[start:end]) for start, end in segments]
+        del audio
+    finally:
+        shm.close()
+    return transcribe_batch(
+        _worker_model, chunks, language=language, task=task, prompt=prompt, word_timestamps=word_timestamps
+    )
+
+
+class ProcessPoolBackend:
+    """Run inference in a pool of worker processes, each with its own copy of the model
+
+    Audio is handed to the workers through shared memory instead of being
+    pickled. The pool is started on first use, because worker processes are
+    spawned and would otherwise re-import the web app while it is loading.
+    """
+
+    def __init__(self, model_name, workers, quantize=False, torch_threads=None):
+        self.model_name = model_name
+        self.workers = workers
+        self.quantize = quantize
+        self.torch_threads = torch_threads  # per worker; defaults to an even share of the CPU cores
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def _get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                torch_threads = self.torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+                context = multiprocessing.get_context("spawn")
+                self.pool = context.Pool(
+                    self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.model_name, torch_threads, self.quantize)
+                )
+            return self.pool
+
+    def transcribe_batches(self, audio, segments, batch_size, language=None, task="transcribe", prompt=None, word_timestamps=False):
+        """Yield the results of each batch of segments, in order
+
+        All batches are submitted up front so idle workers can pick them up
+        while earlier ones are still being decoded. The language is detected
+        once first. Because batches run in parallel, only the first batch is
+        conditioned on prompt and the others are decoded without a prompt;
+        use the thread backend to condition every batch on the one before.
+        """
+        pool = self._get_pool()
+        if segments and language is None:
+            start, end = segments[0]
+            language = pool.apply(_detect_language, (audio[start:end],))
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+        try:
+            np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+            pending = [
+                pool.apply_async(
+                    _transcribe_shared,
+                    (
+                        shm.name, len(audio), segments[i:i+batch_size], language, task,
+                        prompt if i == 0 else None, word_timestamps
+                    )
+                )
+                for i in range(0, len(segments), batch_size)
+            ]
+            for result in pending:
+                yield result.get()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        """Stop the worker processes, freeing their copies of the model"""
+        with self.lock:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool = None
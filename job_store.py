@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class Store:
+    """Dict-style access (store[key], key in store, del store[key]) on top of get/set/delete"""
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def pin(self, key):
+        """Keep key from being evicted until unpin() is called; stores that never evict ignore it"""
+
+    def unpin(self, key):
+        pass
+
+
+class MemoryStore(Store):
+    """Bounded in-process key/value store with TTL and LRU eviction
+
+    Besides get/set/delete it offers set_many() for atomic multi-key
+    changes. Pinned keys (e.g. the tasks of running jobs) are never evicted
+    or expired, so the store may hold more than max_entries while they are.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.pinned = set()
+        self.lock = threading.RLock()
+
+    def _evict(self, now):
+        # Each entry is looked at once at most, so a store full of pinned entries cannot loop
+        for _ in range(len(self.entries)):
+            key, (expires, _) = next(iter(self.entries.items()))
+            if expires > now and len(self.entries) <= self.max_entries:
+                break
+            if key in self.pinned:
+                self.entries.move_to_end(key)
+            else:
+                del self.entries[key]
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (entry[0] <= time.time() and key not in self.pinned):
+                return default
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            now = time.time()
+            self.entries[key] = (now + self.ttl, value)
+            self.entries.move_to_end(key)
+            self._evict(now)
+
+    def set_many(self, items):
+        """Set several keys at once, so readers never see only some of them updated"""
+        with self.lock:
+            for key, value in items.items():
+                self.set(key, value)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def pin(self, key):
+        with self.lock:
+            self.pinned.add(key)
+
+    def unpin(self, key):
+        with self.lock:
+            self.pinned.discard(key)
+
+
+class SQLiteStore(Store):
+    """Key/value store in a SQLite table, shared by every process that opens the same file
+
+    Values are stored as JSON. Expired rows are purged periodically on
+    write; set_many() runs inside an immediate transaction so concurrent
+    writers in other processes cannot interleave with it. Rows are never
+    evicted by count, so pins are not needed.
+    """
+
+    PURGE_EVERY = 500  # writes between purges of expired rows
+
+    def __init__(self, path, table, ttl):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.local = threading.local()
+        self.writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as db:
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def _write(self, db, key, value):
+        db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + self.ttl)
+        )
+
+    def _purge(self, db):
+        self.writes += 1
+        if self.writes % self.PURGE_EVERY == 0:
+            db.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (time.time(),))
+
+    def get(self, key, default=None):
+        row = self._connection().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND expires > ?",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        db = self._connection()
+        self._write(db, key, value)
+        self._purge(db)
+
+    def set_many(self, items):
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for key, value in items.items():
+                self._write(db, key, value)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        self._purge(db)
+
+    def delete(self, key):
+        self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+
+def open_store(table, ttl, max_entries=10000):
+    """Open the task-state store configured with JOB_STORE ("memory" or "sqlite")"""
+    if os.environ.get("JOB_STORE", "memory") == "sqlite":
+        return SQLiteStore(os.environ.get("JOB_STORE_PATH", "jobs.db"), table, ttl)
+    return MemoryStore(max_entries, ttl)
@@ -0,0 +1,112 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format"""
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histogram of observed values with labels, rendered in the Prometheus text format"""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+def gauge(name, help, values):
+    """Render a gauge from {labels tuple: value}, for values read at scrape time"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        lines.append(f"{name}{_format_labels(key)} {value}")
+    return lines
+
+
+stage_seconds = Histogram(
+    'transcriber_stage_seconds',
+    'Wall time spent in each pipeline stage',
+    STAGE_BUCKETS
+)
+stage_failures = Counter('transcriber_stage_failures_total', 'Pipeline stages that raised an error')
+chunks_transcribed = Counter('transcriber_chunks_transcribed_total', 'Speech chunks transcribed')
+audio_transcribed = Counter('transcriber_audio_seconds_total', 'Seconds of audio transcribed')
+cache_requests = Counter('transcriber_cache_requests_total', 'Transcript cache lookups by result')
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time the body of a with block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_failures.inc(stage=stage, **labels)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage, **labels)
+
+
+def render(*sections):
+    """Render all built-in metrics plus extra sections of lines as a Prometheus exposition"""
+    lines = []
+    for metric in (stage_seconds, stage_failures, chunks_transcribed, audio_transcribed, cache_requests):
+        lines.extend(metric.render())
+    for section in sections:
+        lines.extend(section)
+    return '\n'.join(lines) + '\n'
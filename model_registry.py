@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Approximate resident memory of each Whisper model in fp32, in MB
+MODEL_MEMORY_MB = {
+    'tiny': 150,
+    'base': 290,
+    'small': 970,
+    'medium': 3100,
+    'large': 6200,
+}
+
+
+class ModelRegistry:
+    """Keeps several Whisper models loaded at once within a memory budget
+
+    Models are loaded on first use by loader(name), which returns an
+    inference backend, and unloaded least recently used first when loading
+    another one would go over budget_mb. Models that are in use by a job
+    are never unloaded; if they alone exceed the budget, the new model is
+    loaded anyway rather than failing the job.
+    """
+
+    def __init__(self, loader, budget_mb, allowed, copies=1):
+        self.loader = loader
+        self.budget_mb = budget_mb
+        self.allowed = list(allowed)
+        self.copies = copies  # copies of each model held, e.g. one per inference process
+        self.backends = OrderedDict()
+        self.in_use = {}
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def cost(self, name):
+        """Estimated memory in MB that loading a model takes"""
+        return MODEL_MEMORY_MB.get(name.split('.')[0], MODEL_MEMORY_MB['large']) * self.copies
+
+    def is_loaded(self, name):
+        with self.lock:
+            return name in self.backends
+
+    def loaded(self):
+        """Names of the loaded models, least recently used first"""
+        with self.lock:
+            return list(self.backends)
+
+    def _make_room(self, name):
+        """Unload idle models, least recently used first, until name fits in the budget"""
+        unloaded = []
+        used = sum(self.cost(loaded) for loaded in self.backends)
+        for loaded in list(self.backends):
+            if used + self.cost(name) <= self.budget_mb:
+                break
+            if self.in_use.get(loaded):
+                continue
+            unloaded.append(self.backends.pop(loaded))
+            used -= self.cost(loaded)
+            print(f"Unloading model '{loaded}' to stay within the {self.budget_mb} MB model budget")
+        return unloaded
+
+    def get(self, name):
+        """Return the backend for a model, loading it first if needed
+
+        Concurrent requests for a model that is being loaded wait for that
+        load instead of starting another one.
+        """
+        if name not in self.allowed:
+            raise ValueError(f"Unknown model: {name}")
+
+        while True:
+            with self.lock:
+                if name in self.backends:
+                    self.backends.move_to_end(name)
+                    return self.backends[name]
+                event = self.loading.get(name)
+                if event is None:
+                    event = self.loading[name] = threading.Event()
+                    unloaded = self._make_room(name)
+                    break
+            event.wait()
+
+        for backend in unloaded:
+            backend.close()
+        try:
+            print(f"Loading model '{name}'...")
+            backend = self.loader(name)
+            with self.lock:
+                self.backends[name] = backend
+            return backend
+        finally:
+            with self.lock:
+                del self.loading[name]
+            event.set()
+
+    @contextmanager
+    def acquire(self, name):
+        """Use a model for the duration of a with block, keeping it from being unloaded"""
+        with self.lock:
+            self.in_use[name] = self.in_use.get(name, 0) + 1
+        try:
+            yield self.get(name)
+        finally:
+            with self.lock:
+                self.in_use[name] -= 1
+
+    def warm_up(self, names):
+        """Load models in a background thread so startup does not wait for them"""
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Error loading model '{name}': {str(e)}")
+
+        thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,619 @@
+import copy
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import torch
+import yt_dlp
+from whisper.audio import N_SAMPLES, SAMPLE_RATE
+
+from artifact_index import shard_dir
+from audio_decoder import decode_audio, iter_audio_chunks, probe_duration
+from batch_decoder import next_prompt
+from eta import ThroughputModel
+from inference import ProcessPoolBackend, ThreadBackend, load_model
+from job_store import MemoryStore, open_store
+from metrics import audio_transcribed, chunks_transcribed, span
+from model_registry import ModelRegistry
+from segmentation import iter_speech_blocks, speech_segments
+from transcript import Transcript
+
+# Set the path to FFmpeg before loading the model
+os.environ["PATH"] = os.getcwd() + os.pathsep + os.environ.get("PATH", "")
+MODEL_NAME = os.environ.get("WHISPER_MODEL", "base")  # default model: "tiny", "base", "small", "medium", "large"
+
+# Number of 30 second chunks decoded together in one encoder/decoder pass
+BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "4"))
+
+# Run inference in this process ("thread") or in a pool of worker processes ("process")
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "thread")
+
+# Keep the timing of every word, at the cost of an extra alignment pass per chunk
+WORD_TIMESTAMPS = os.environ.get("WORD_TIMESTAMPS", "1") == "1"
+
+# Start transcribing while the audio is still downloading by decoding it from the stream
+PIPELINED = os.environ.get("PIPELINED_TRANSCRIPTION", "0") == "1"
+
+# Audio longer than this many seconds is decoded a window at a time instead of all at once (0 = never)
+LONG_AUDIO_SECONDS = int(os.environ.get("LONG_AUDIO_SECONDS", "3600"))
+
+# Video info, in memory or in SQLite shared by every process on the node (JOB_STORE)
+video_info = open_store('video_info', ttl=int(os.environ.get("VIDEO_INFO_TTL_DAYS", "7")) * 24 * 3600)
+
+# Raw yt-dlp metadata of recent videos, so the audio and video downloads of a video
+# resolve its page only once (stream URLs expire after a few hours)
+media_info = MemoryStore(max_entries=256, ttl=int(os.environ.get("MEDIA_INFO_TTL_MINUTES", "60")) * 60)
+
+# Observed download speeds and real-time factors on this node, used for ETAs
+throughput = ThroughputModel()
+
+# Models a request may ask for, and the ones loaded in the background at startup
+AVAILABLE_MODELS = os.environ.get("WHISPER_MODELS", "tiny,base,small").split(",")
+if MODEL_NAME not in AVAILABLE_MODELS:
+    AVAILABLE_MODELS.append(MODEL_NAME)
+PRELOAD_MODELS = os.environ.get("WHISPER_PRELOAD", MODEL_NAME).split(",")
+
+# Quantize the models' linear layers to int8 for faster CPU inference ("int8"), or keep float32 ("none")
+QUANTIZE = os.environ.get("WHISPER_QUANTIZE", "none") == "int8"
+
+# Torch intra-op threads per inference worker (0 keeps torch's default, or an even share of the
+# cores for each process of the process backend)
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", "0"))
+
+# Memory that loaded models may take together before the least recently used is unloaded
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", "2048"))
+
+# Loaded models, created once per process by init_inference()
+models = None
+models_lock = threading.Lock()
+
+def inference_workers():
+    """Number of inference processes per model for the process backend"""
+    return int(os.environ.get("INFERENCE_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 2)
+
+def load_backend(model_name):
+    """Create an inference backend for one model"""
+    if INFERENCE_BACKEND == "process":
+        return ProcessPoolBackend(
+            model_name, workers=inference_workers(), quantize=QUANTIZE, torch_threads=TORCH_THREADS or None
+        )
+    with span('model_load', model=model_name):
+        return ThreadBackend(load_model(model_name, quantize=QUANTIZE))
+
+def init_inference():
+    """Create this process's model registry and start loading the preloaded models"""
+    global models
+    with models_lock:
+        if models is None:
+            if TORCH_THREADS and INFERENCE_BACKEND != "process":
+                torch.set_num_threads(TORCH_THREADS)
+            models = ModelRegistry(
+                load_backend,
+                budget_mb=MODEL_MEMORY_BUDGET_MB,
+                allowed=AVAILABLE_MODELS,
+                copies=inference_workers() if INFERENCE_BACKEND == "process" else 1
+            )
+            # Process backends start their workers on first use, so there is nothing to warm up
+            if INFERENCE_BACKEND != "process":
+                models.warm_up(PRELOAD_MODELS)
+    return models
+
+def extract_video_id(url):
+    """Extract video ID from various YouTube URL formats"""
+    patterns = [
+        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+        r'youtu\.be\/([0-9A-Za-z_-]{11})',
+        r'youtube\.com\/embed\/([0-9A-Za-z_-]{11})'
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    
+    return None
+
+def extract_media_info(ydl, url, video_id):
+    """Extract a video's metadata, reusing what an earlier download of the same video fetched
+
+    Returns the unprocessed info dict, which ydl.process_ie_result() turns
+    into a download with the format selection of whichever YoutubeDL runs it.
+    """
+    info = media_info.get(video_id)
+    if info is None:
+        with span('metadata'):
+            info = ydl.extract_info(url, download=False, process=False)
+        media_info.set(video_id, info)
+    # Processing fills in the dict, so every download gets its own copy
+    return copy.deepcopy(info)
+
+def download_with_info(ydl, info):
+    """Download from extracted metadata without resolving the page again; returns (info, file path)"""
+    info = ydl.process_ie_result(info, download=True)
+    return info, info['requested_downloads'][0]['filepath']
+
+def open_audio_stream(url, video_id):
+    """Resolve the direct URL of the best audio stream so ffmpeg can decode it as it downloads"""
+    with yt_dlp.YoutubeDL({'format': 'bestaudio/best', 'quiet': True}) as ydl:
+        info = ydl.process_ie_result(extract_media_info(ydl, url, video_id), download=False)
+    
+    # Pass the same HTTP headers yt-dlp would use, or the stream may be refused
+    headers = ''.join(f'{key}: {value}\r\n' for key, value in info.get('http_headers', {}).items())
+    input_args = ['-headers', headers] if headers else []
+    print(f"Streaming audio: {info['title']}")
+    return info, input_args
+
+def audio_download_options(report=None):
+    """yt-dlp options that download the best audio track to downloads/{shard}/{video_id}_audio.{ext}
+
+    report(fraction, remaining_seconds, duration) is called as a download
+    progresses, with the estimated download time left and the video's
+    duration if known.
+    """
+    def progress_hook(status):
+        if status.get('status') != 'downloading':
+            return
+        throughput.observe_download(speed=status.get('speed'))
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        if report and total:
+            downloaded = status.get('downloaded_bytes', 0)
+            report(
+                downloaded / total,
+                throughput.download_seconds(remaining_bytes=total - downloaded),
+                status.get('info_dict', {}).get('duration')
+            )
+    
+    return {
+        'format': 'bestaudio/best',
+        'outtmpl': os.path.join(os.getcwd(), "downloads", '%(id).2s', '%(id)s_audio.%(ext)s'),
+        'quiet': False,
+        'no_warnings': False,
+        'ffmpeg_location': '.',
+        'progress_hooks': [progress_hook],
+    }
+
+# Per-video locks, so jobs for the same video (e.g. with different models) share one audio download
+download_locks = {}
+download_locks_lock = threading.Lock()
+
+@contextmanager
+def video_download_lock(video_id):
+    """Hold the download lock of a video; the lock is dropped once nobody holds or waits for it"""
+    with download_locks_lock:
+        entry = download_locks.setdefault(video_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with download_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del download_locks[video_id]
+
+def download_audio(url, video_id, report=None, ydl=None):
+    """Download the audio track using yt-dlp, or reuse the one already downloaded for the video
+
+    report is passed to audio_download_options(). A YoutubeDL created with
+    those options can be passed as ydl to reuse it across downloads.
+
+    Only one download per video runs at a time, and files already on disk
+    are never removed: other jobs may be reading them, and the MP3 built
+    for download shares their name pattern.
+    """
+    try:
+        with video_download_lock(video_id):
+            # A job for another model, a batch prefetch or an earlier run may have fetched it already
+            info = video_info.get(video_id) or {}
+            audio_file = info.get('original_audio_file')
+            if audio_file and os.path.exists(audio_file):
+                print(f"Reusing downloaded audio file: {audio_file}")
+                return audio_file, info.get('title', 'Unknown Title')
+            
+            # Ensure the video's downloads directory exists
+            downloads_dir = shard_dir(os.path.join(os.getcwd(), "downloads"), video_id)
+            os.makedirs(downloads_dir, exist_ok=True)
+            
+            # Download audio; yt-dlp reuses a complete file already at its path and resumes a partial one
+            with yt_dlp.YoutubeDL(audio_download_options(report)) if ydl is None else nullcontext(ydl) as ydl:
+                info = extract_media_info(ydl, url, video_id)
+                print(f"Downloading audio: {info['title']}")
+                with span('audio_download'):
+                    info, audio_file = download_with_info(ydl, info)
+            
+            if not os.path.exists(audio_file):
+                raise Exception("Could not find downloaded audio file")
+            print(f"Found downloaded audio file: {audio_file}")
+            throughput.observe_download(total_bytes=os.path.getsize(audio_file), audio_seconds=info.get('duration'))
+            
+            # Store video info for later use
+            video_info[video_id] = {
+                'title': info.get('title', 'Unknown Title'),
+                'url': url,
+                'duration': info.get('duration'),
+                'original_audio_file': audio_file
+            }
+            
+            return audio_file, info.get('title', 'Unknown Title')
+    except Exception as e:
+        print(f"Error in download_audio: {str(e)}")
+        raise Exception(f"Error downloading audio: {str(e)}")
+
+def expand_playlist(url, limit):
+    """List up to limit videos of a playlist or channel with a single metadata request
+
+    A plain video URL gives a list with just that video. Returns dicts with
+    url, video_id and title.
+    """
+    options = {'extract_flat': 'in_playlist', 'playlistend': limit, 'quiet': True}
+    with yt_dlp.YoutubeDL(options) as ydl, span('metadata'):
+        info = ydl.extract_info(url, download=False)
+    
+    videos = []
+    for entry in info.get('entries') or [info]:
+        video_url = f"https://www.youtube.com/watch?v={entry.get('id')}" if entry else ''
+        # Skip deleted/private entries and nested playlists such as channel tabs
+        if entry and extract_video_id(video_url) == entry['id']:
+            videos.append({'url': video_url, 'video_id': entry['id'], 'title': entry.get('title')})
+    return videos[:limit]
+
+def download_video(url, video_id, report=None):
+    """Download the video (up to 720p) using yt-dlp"""
+    try:
+        # Ensure the video's downloads directory exists
+        downloads_dir = shard_dir(os.path.join(os.getcwd(), "downloads"), video_id)
+        os.makedirs(downloads_dir, exist_ok=True)
+        
+        # File paths; a complete file already there (e.g. left by a failed transcode) is reused by yt-dlp
+        original_video = os.path.join(downloads_dir, f'{video_id}_video')
+        
+        def progress_hook(status):
+            total = status.get('total_bytes') or status.get('total_bytes_estimate')
+            if report and status.get('status') == 'downloading' and total:
+                report(status.get('downloaded_bytes', 0) / total)
+        
+        # Download video
+        video_opts = {
+            'format': 'best[height<=720]/best',  # Download best quality up to 720p
+            'outtmpl': f'{original_video}.%(ext)s',
+            'quiet': False,
+            'no_warnings': False,
+            'ffmpeg_location': '.',
+            'progress_hooks': [progress_hook],
+        }
+        
+        with yt_dlp.YoutubeDL(video_opts) as ydl:
+            info = extract_media_info(ydl, url, video_id)
+            print(f"Downloading video: {url}")
+            with span('video_download'):
+                _, video_file = download_with_info(ydl, info)
+        
+        if not os.path.exists(video_file):
+            raise Exception("Could not find downloaded video file")
+        print(f"Found downloaded video file: {video_file}")
+        return video_file
+    except Exception as e:
+        print(f"Error in download_video: {str(e)}")
+        raise Exception(f"Error downloading video: {str(e)}")
+
+def with_eta(status, eta):
+    """Add the estimated time left, and when the job should complete, to a progress status"""
+    return dict(status, eta_seconds=round(eta), completes_at=time.time() + eta)
+
+def transcribe_video(url, report, model_name=None, on_chunk=None, on_media_info=None, audio_file=None):
+    """Download and transcribe a video with a Whisper model, passing every state change to report(state)
+
+    model_name defaults to MODEL_NAME. Returns the result once the transcript is complete, or None after
+    reporting a FAILURE state. on_chunk(chunk) receives the text and
+    timestamps of each chunk as soon as it is decoded, and
+    on_media_info(video_id) is called once the video's info is known.
+
+    Progress statuses carry an ETA (eta_seconds and completes_at) based on
+    the download speeds and real-time factor observed on this node.
+
+    audio_file is audio that download_audio() already fetched, e.g. on a
+    download pool; the download step is then skipped.
+    """
+    try:
+        # Update task status
+        model_name = model_name or MODEL_NAME
+        report({
+            'state': 'PROGRESS',
+            'status': with_eta(
+                {'current': 1, 'total': 10, 'status': 'Extracting video info...'},
+                throughput.job_seconds(model_name)
+            )
+        })
+        
+        # Extract video ID and validate
+        video_id = extract_video_id(url)
+        if not video_id:
+            report({
+                'state': 'FAILURE',
+                'status': 'Invalid YouTube URL format'
+            })
+            return
+        
+        if PIPELINED and audio_file is None:
+            # Start decoding the audio stream right away
+            try:
+                info, input_args = open_audio_stream(url, video_id)
+                video_title = info.get('title', 'Unknown Title')
+                audio_duration = info.get('duration') or 0
+                video_info[video_id] = {
+                    'title': video_title,
+                    'url': url,
+                    'duration': info.get('duration')
+                }
+                blocks = iter_speech_blocks(iter_audio_chunks(info['url'], BATCH_SIZE * N_SAMPLES, input_args))
+            except Exception as e:
+                report({
+                    'state': 'FAILURE',
+                    'status': f'Error opening audio stream: {str(e)}'
+                })
+                return
+        else:
+            # Update task status
+            report({
+                'state': 'PROGRESS',
+                'status': with_eta(
+                    {'current': 2, 'total': 10, 'status': 'Downloading audio...'},
+                    throughput.job_seconds(model_name)
+                )
+            })
+            
+            last_report = [0.0]
+            
+            def download_progress(fraction, remaining, duration):
+                # yt-dlp calls this many times a second; pass on at most one update a second
+                now = time.time()
+                if now - last_report[0] < 1:
+                    return
+                last_report[0] = now
+                report({
+                    'state': 'PROGRESS',
+                    'status': with_eta(
+                        {'current': 2 + fraction, 'total': 10, 'status': f'Downloading audio ({int(fraction * 100)}%)...'},
+                        remaining + throughput.transcription_seconds(model_name, duration or throughput.job_duration)
+                    )
+                })
+            
+            # Download media using yt-dlp
+            try:
+                if audio_file is None:
+                    audio_file, video_title = download_audio(url, video_id, report=download_progress)
+                else:
+                    video_title = video_info[video_id]['title']
+                
+                # Verify the audio file exists and is accessible
+                if not os.path.exists(audio_file):
+                    report({
+                        'state': 'FAILURE',
+                        'status': f'Audio file not found: {audio_file}'
+                    })
+                    return
+                    
+                # Get file size to verify it's not empty
+                file_size = os.path.getsize(audio_file)
+                if file_size == 0:
+                    report({
+                        'state': 'FAILURE',
+                        'status': 'Downloaded audio file is empty'
+                    })
+                    return
+                    
+                print(f"Audio file: {audio_file}, Size: {file_size} bytes")
+            except Exception as e:
+                report({
+                    'state': 'FAILURE',
+                    'status': str(e)
+                })
+                return
+            
+            # Update task status
+            report({
+                'state': 'PROGRESS',
+                'status': with_eta(
+                    {'current': 3, 'total': 10, 'status': 'Preparing audio for transcription...'},
+                    throughput.transcription_seconds(model_name, video_info[video_id].get('duration') or throughput.job_duration)
+                )
+            })
+            
+            duration = video_info[video_id].get('duration') or probe_duration(audio_file)
+            if LONG_AUDIO_SECONDS and (duration or 0) > LONG_AUDIO_SECONDS:
+                # Decode and segment long audio one window at a time, as a stream is, so only
+                # a few windows of samples are held whatever the length of the video
+                audio_duration = duration
+                print(f"Audio duration: {audio_duration:.2f} seconds, transcribing in windows")
+                blocks = iter_speech_blocks(iter_audio_chunks(audio_file, BATCH_SIZE * N_SAMPLES))
+            else:
+                # Load audio and prepare for chunked transcription
+                try:
+                    with span('decode_audio'):
+                        audio = decode_audio(audio_file)
+                    audio_duration = len(audio) / SAMPLE_RATE
+                    print(f"Audio duration: {audio_duration:.2f} seconds")
+                except Exception as e:
+                    report({
+                        'state': 'FAILURE',
+                        'status': f'Error loading audio: {str(e)}'
+                    })
+                    return
+                
+                # Split audio into speech segments of up to 30 seconds each, skipping silence
+                with span('segment'):
+                    segments = speech_segments(audio, max_duration=30)
+                print(f"Found {len(segments)} speech segments "
+                      f"({sum(end - start for start, end in segments) / SAMPLE_RATE:.2f}s of speech)")
+                blocks = [(0, audio, segments)]
+        
+        if on_media_info:
+            on_media_info(video_id)
+        
+        # Update task status
+        registry = init_inference()
+        report({
+            'state': 'PROGRESS',
+            'status': with_eta(
+                {
+                    'current': 4,
+                    'total': 10,
+                    'status': 'Starting transcription...' if registry.is_loaded(model_name)
+                              else 'Loading speech recognition model...'
+                },
+                throughput.transcription_seconds(model_name, audio_duration or throughput.job_duration)
+            )
+        })
+        
+        # Transcribe with language detection using chunked approach
+        try:
+            transcription_parts = []
+            timed_parts = []
+            transcript_segments = []
+            detected_language = None
+            prompt = None
+            transcribed_until = 0.0  # seconds of audio covered by the batches done so far
+            
+            # Start transcription phase (steps 4 to 8)
+            with registry.acquire(model_name) as backend:
+                for offset, block, segments in blocks:
+                    # The language is detected once, on the first speech segment, and kept for the
+                    # rest of the video; each block carries on from the last text decoded before it
+                    batches = backend.transcribe_batches(
+                        block, segments, BATCH_SIZE, language=detected_language, task="transcribe", prompt=prompt,
+                        word_timestamps=WORD_TIMESTAMPS
+                    )
+                    for i in range(0, len(segments), BATCH_SIZE):
+                        batch_segments = segments[i:i+BATCH_SIZE]
+                        batch_start = (offset + batch_segments[0][0]) / SAMPLE_RATE
+                        batch_end = (offset + batch_segments[-1][1]) / SAMPLE_RATE
+                    
+                        # Calculate progress within the transcription phase (4 to 8)
+                        progress_in_transcription = min(batch_start / audio_duration, 1) * 4 if audio_duration else 0  # 4 is the range from 4 to 8
+                        current_progress = 4 + progress_in_transcription
+                    
+                        # Update task status for each batch of chunks
+                        report({
+                            'state': 'PROGRESS',
+                            'status': with_eta(
+                                {
+                                    'current': current_progress, 
+                                    'total': 10, 
+                                    'status': f'Transcribing {int(batch_start)}-{int(batch_end)}/{int(audio_duration)}s...'
+                                },
+                                throughput.transcription_seconds(model_name, max(audio_duration - transcribed_until, 0))
+                            )
+                        })
+                    
+                        # Wait for the whole batch to be transcribed in one encoder/decoder pass
+                        batch_started = time.perf_counter()
+                        with span('inference_batch', model=model_name):
+                            results = next(batches)
+                        
+                        # The real-time factor covers the silence skipped between segments too,
+                        # so it can be applied to the remaining duration of the audio
+                        throughput.observe_rtf(model_name, batch_end - transcribed_until, time.perf_counter() - batch_started)
+                        transcribed_until = batch_end
+                        chunks_transcribed.inc(len(results), model=model_name)
+                        audio_transcribed.inc(sum(end - start for start, end in batch_segments) / SAMPLE_RATE, model=model_name)
+                    
+                        # Set language from first chunk
+                        if detected_language is None:
+                            detected_language = results[0].get("language", "unknown")
+                        prompt = next_prompt(results, prompt)
+                    
+                        for (start, end), result in zip(batch_segments, results):
+                            transcription_parts.append(result["text"])
+                            timed_parts.append({
+                                'start': (offset + start) / SAMPLE_RATE,
+                                'end': (offset + end) / SAMPLE_RATE,
+                                'text': result["text"].strip()
+                            })
+                            
+                            # Shift the chunk's segment and word timings to time in the video
+                            shift = (offset + start) / SAMPLE_RATE
+                            for segment in result["segments"]:
+                                transcript_segments.append(dict(
+                                    segment,
+                                    start=segment["start"] + shift,
+                                    end=segment["end"] + shift,
+                                    words=[
+                                        dict(word, start=word["start"] + shift, end=word["end"] + shift)
+                                        for word in segment["words"]
+                                    ]
+                                ))
+                        
+                            # Hand out the text as soon as it is decoded
+                            if on_chunk:
+                                on_chunk(dict(
+                                    timed_parts[-1],
+                                    language=detected_language,
+                                    progress=(offset + end) / SAMPLE_RATE / audio_duration if audio_duration else None
+                                ))
+            
+            # Combine all transcriptions
+            throughput.observe_job(audio_duration)
+            transcription = " ".join(transcription_parts)
+            detected_language = detected_language or "unknown"
+            print(f"Transcription completed. Language: {detected_language}")
+            
+        except Exception as e:
+            report({
+                'state': 'FAILURE',
+                'status': f'Error transcribing audio: {str(e)}'
+            })
+            return
+        
+        # Return the result
+        return {
+            "success": True,
+            "transcription": transcription,
+            "title": video_title,
+            "video_id": video_id,
+            "url": url,
+            "duration": audio_duration,
+            "language": detected_language,
+            "model": model_name,
+            "segments": transcript_segments
+        }
+        
+    except Exception as e:
+        report({
+            'state': 'FAILURE',
+            'status': f'Unexpected error: {str(e)}'
+        })
+
+def save_transcript(result):
+    """Write a finished transcript to downloads/{shard}/{video_id}.txt and return the file name
+
+    The segment and word timings are saved as a Transcript in
+    downloads/{shard}/{video_id}.npz, for the SRT/VTT/JSON downloads. The
+    words are then dropped from result, which keeps only the segments.
+    Both files are written under a temporary name first, so an interrupted
+    save never leaves a truncated transcript behind.
+
+    The files are per video, not per model: they hold the transcript of
+    whichever job for the video finished last, while the transcript cache
+    keeps one result per model.
+    """
+    downloads_dir = shard_dir("downloads", result['video_id'])
+    os.makedirs(downloads_dir, exist_ok=True)
+    txt_filename = os.path.join(downloads_dir, f"{result['video_id']}.txt")
+    npz_filename = os.path.join(downloads_dir, f"{result['video_id']}.npz")
+    suffix = f".{threading.get_ident()}.tmp"
+    with open(txt_filename + suffix, "w", encoding="utf-8") as f:
+        f.write(f"Title: {result['title']}\n")
+        f.write(f"URL: {result['url']}\n")
+        f.write(f"Language: {result['language']}\n\n")
+        f.write(result['transcription'])
+    Transcript.from_segments(result['segments']).save(npz_filename + suffix)
+    os.replace(txt_filename + suffix, txt_filename)
+    os.replace(npz_filename + suffix, npz_filename)
+    
+    result['segments'] = [
+        {'start': segment['start'], 'end': segment['end'], 'text': segment['text']}
+        for segment in result['segments']
+    ]
+    return txt_filename
@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import os
+import threading
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+def default_worker_count(job_memory_mb=1024):
+    """Size the worker pool to the CPU cores and the memory a job needs
+
+    Inference already uses several threads per job, so one worker per four
+    cores keeps the machine busy without oversubscribing it.
+    """
+    workers = max(1, (os.cpu_count() or 1) // 4)
+    try:
+        total_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+        workers = min(workers, max(1, total_mb // job_memory_mb))
+    except (AttributeError, ValueError, OSError):
+        pass
+    return workers
+
+
+class JobScheduler:
+    """Fixed-size pool of worker threads fed from a bounded priority queue
+
+    Jobs with a higher priority run first; jobs with the same priority run in
+    the order they were submitted.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue = []
+        self.queued = {}
+        self.active = set()
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"transcriber-{i}", daemon=True)
+            thread.start()
+
+    def submit(self, job_id, func, args=(), priority=0):
+        """Queue a job, raising QueueFull if there is no room left"""
+        with self.condition:
+            if len(self.queued) >= self.max_queue:
+                raise QueueFull(f"Queue is full ({self.max_queue} jobs waiting)")
+            entry = [-priority, next(self.counter), job_id, func, args]
+            self.queued[job_id] = entry
+            heapq.heappush(self.queue, entry)
+            self.condition.notify()
+
+    def cancel(self, job_id):
+        """Remove a job that has not started yet; returns False if it is not queued"""
+        with self.condition:
+            entry = self.queued.pop(job_id, None)
+            if entry is None:
+                return False
+            # Cancelled entries stay in the heap and are skipped when popped
+            entry[2] = None
+            return True
+
+    def position(self, job_id):
+        """Return the 1-based position of a queued job, or None if it is not queued"""
+        with self.condition:
+            entry = self.queued.get(job_id)
+            if entry is None:
+                return None
+            return sum(1 for other in self.queued.values() if other[:2] <= entry[:2])
+
+    def queue_depth(self):
+        with self.condition:
+            return len(self.queued)
+
+    def active_jobs(self):
+        with self.condition:
+            return len(self.active)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.queued:
+                    self.condition.wait()
+                _, _, job_id, func, args = heapq.heappop(self.queue)
+                if job_id is None:
+                    continue
+                del self.queued[job_id]
+                self.active.add(job_id)
+
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error in job {job_id}: {str(e)}")
+            finally:
+                with self.condition:
+                    self.active.discard(job_id)
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+def _match_query(text):
+    """Turn free text into an FTS5 query matching segments that contain every word
+
+    Each word is quoted, so punctuation and FTS5 operators in user input are
+    searched for literally instead of raising a syntax error.
+    """
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class TranscriptIndex:
+    """Full-text index of finished transcripts in SQLite FTS5, one row per segment
+
+    Segments keep their start and end time, so a hit points at the moment
+    in the video where the words are spoken. Transcripts are added as jobs
+    finish; adding a video again replaces its segments. The database file
+    can be shared by every process on the node.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._connection()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS videos "
+            "(video_id TEXT PRIMARY KEY, title TEXT, url TEXT, language TEXT, model TEXT, indexed_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS segments "
+            "(id INTEGER PRIMARY KEY, video_id TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL, text TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS segments_video ON segments (video_id)")
+        # External-content FTS table: the text is stored once, in segments, and kept in sync by triggers
+        db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5"
+            "(text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        db.execute(
+            "CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN "
+            "INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text); END"
+        )
+        db.execute(
+            "CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN "
+            "INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+        )
+
+    def _connection(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def add(self, video_id, segments, title=None, url=None, language=None, model=None):
+        """Index (or re-index) a video's transcript from dicts with start, end and text"""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM segments WHERE video_id = ?", (video_id,))
+            db.executemany(
+                "INSERT INTO segments (video_id, start, end, text) VALUES (?, ?, ?, ?)",
+                [(video_id, segment['start'], segment['end'], segment['text'].strip()) for segment in segments]
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO videos (video_id, title, url, language, model, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, title, url, language, model, time.time())
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def __contains__(self, video_id):
+        return self._connection().execute(
+            "SELECT 1 FROM videos WHERE video_id = ?", (video_id,)
+        ).fetchone() is not None
+
+    def search(self, text, limit=20, video_id=None):
+        """Return the best matching segments for the words of text, best first
+
+        Each hit has the video's ID, title and URL, the segment's start and
+        end time, and a snippet of its text with the matches in [brackets].
+        """
+        query = _match_query(text)
+        if not query:
+            return []
+        sql = (
+            "SELECT s.video_id, v.title, v.url, s.start, s.end, "
+            "snippet(segments_fts, 0, '[', ']', '...', 16) "
+            "FROM segments_fts "
+            "JOIN segments s ON s.id = segments_fts.rowid "
+            "JOIN videos v ON v.video_id = s.video_id "
+            "WHERE segments_fts MATCH ?"
+        )
+        params = [query]
+        if video_id:
+            sql += " AND s.video_id = ?"
+            params.append(video_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        return [
+            {
+                'video_id': row[0],
+                'title': row[1],
+                'url': row[2],
+                'start': row[3],
+                'end': row[4],
+                'text': row[5],
+                # Opens the video at the start of the segment
+                'link': f"https://www.youtube.com/watch?v={row[0]}&t={int(row[3])}s",
+            }
+            for row in self._connection().execute(sql, params)
+        ]
@@ -0,0 +1,133 @@
+import numpy as np
+from whisper.audio import SAMPLE_RATE
+
+FRAME_DURATION = 0.03  # seconds of audio per energy frame
+ENERGY_MARGIN_DB = 12.0  # how far above the noise floor a frame must be to count as speech
+MIN_ENERGY_DB = -50.0  # frames quieter than this are always treated as silence
+MIN_SPEECH_DURATION = 0.25  # shorter bursts (clicks, breaths) are dropped
+MIN_SILENCE_DURATION = 0.5  # shorter pauses are kept inside a speech region
+SPEECH_PAD_DURATION = 0.2  # padding kept around each speech region
+SPLIT_SEARCH_DURATION = 5.0  # how far back to look for a quiet split point in long regions
+
+
+def frame_energy_db(audio, frame_length):
+    """Return the RMS energy of each frame of the audio in dBFS"""
+    n_frames = len(audio) // frame_length
+    frames = audio[:n_frames * frame_length].reshape(n_frames, frame_length)
+    power = np.einsum('ij,ij->i', frames, frames) / frame_length
+    return 10 * np.log10(np.maximum(power, 1e-10))
+
+
+def speech_regions(energy_db, frame_duration=FRAME_DURATION):
+    """Find speech regions in per-frame energies, as (start_frame, end_frame) pairs"""
+    if len(energy_db) == 0:
+        return []
+
+    # Without quiet frames well below the loud ones (e.g. a block of continuous speech or music)
+    # the 10th percentile is not noise, so everything above the silence level is kept
+    noise_floor, loud = np.percentile(energy_db, [10, 90])
+    if loud - noise_floor < ENERGY_MARGIN_DB:
+        is_speech = energy_db > MIN_ENERGY_DB
+    else:
+        is_speech = energy_db > max(noise_floor + ENERGY_MARGIN_DB, MIN_ENERGY_DB)
+
+    # Run boundaries of the speech mask
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_silence = int(MIN_SILENCE_DURATION / frame_duration)
+    min_speech = int(MIN_SPEECH_DURATION / frame_duration)
+    pad = int(SPEECH_PAD_DURATION / frame_duration)
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    return [
+        (max(start - pad, 0), min(end + pad, len(energy_db)))
+        for start, end in regions
+        if end - start >= min_speech
+    ]
+
+
+def pack_regions(regions, energy_db, max_frames, search_frames):
+    """Merge speech regions into segments of at most max_frames frames
+
+    Regions longer than max_frames are split at the quietest frame near the
+    limit so words are not cut in half.
+    """
+    segments = []
+    for start, end in regions:
+        if segments and end - segments[-1][0] <= max_frames:
+            segments[-1][1] = end
+            continue
+        if segments:
+            start = max(start, segments[-1][1])
+
+        while end - start > max_frames:
+            window = energy_db[start + max_frames - search_frames:start + max_frames]
+            split = start + max_frames - search_frames + int(np.argmin(window))
+            segments.append([start, split])
+            start = split
+        segments.append([start, end])
+
+    return [(start, end) for start, end in segments]
+
+
+def speech_segments(audio, max_duration=30):
+    """Split audio from whisper.load_audio() into speech segments
+
+    Returns (start_sample, end_sample) pairs for segments no longer than
+    max_duration seconds; silence between them is left out entirely.
+    """
+    frame_length = int(FRAME_DURATION * SAMPLE_RATE)
+    energy_db = frame_energy_db(audio, frame_length)
+
+    regions = speech_regions(energy_db)
+    max_frames = int(max_duration / FRAME_DURATION)
+    search_frames = min(int(SPLIT_SEARCH_DURATION / FRAME_DURATION), max_frames - 1)
+    segments = pack_regions(regions, energy_db, max_frames, search_frames)
+
+    return [
+        (start * frame_length, min(end * frame_length, len(audio)))
+        for start, end in segments
+    ]
+
+
+def iter_speech_blocks(chunks, max_duration=30):
+    """Segment audio that arrives as consecutive chunks, as soon as each chunk is available
+
+    Yields (offset, block, segments) where offset is the sample position of
+    block in the whole stream and segments are relative to block. A segment
+    that runs into the end of a chunk is carried over to the next one so
+    speech is never cut at a chunk boundary; what is still carried when the
+    chunks run out is yielded as a last block.
+    """
+    frame_length = int(FRAME_DURATION * SAMPLE_RATE)
+    carry = np.empty(0, dtype=np.float32)
+    offset = 0
+
+    for chunk in chunks:
+        block = np.concatenate((carry, chunk)) if len(carry) else chunk
+        segments = speech_segments(block, max_duration=max_duration)
+
+        carry = np.empty(0, dtype=np.float32)
+        if segments and segments[-1][1] >= len(block) - frame_length:
+            last_segment = segments.pop()
+            carry = block[last_segment[0]:]
+            # A full-length segment cannot grow any further, so emit it now
+            if len(carry) >= max_duration * SAMPLE_RATE:
+                segments.append(last_segment)
+                carry = np.empty(0, dtype=np.float32)
+
+        if segments:
+            yield offset, block, segments
+        offset += len(block) - len(carry)
+
+    # The carry is the last segment found, which ran to the end of the stream
+    if len(carry):
+        yield offset, carry, [(0, len(carry))]
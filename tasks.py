@@ -1,138 +1,76 @@
-from celery import Celery
-import whisper
-from pytube import YouTube
+import json
 import os
-import re
-from urllib.parse import parse_qs, urlparse
 
-# Configure Celery
-celery = Celery('tasks', broker='C:\Users\ADMIN\Documents\youtube\Redis-x64-3.0.504.msi', backend='rpc://')
+from celery import Celery
+from celery.signals import worker_process_init
+
+import pipeline
+
+# Configure Celery (memory:// and cache+memory:// work when the worker runs in the same process, e.g. in tests)
+celery = Celery(
+    'tasks',
+    broker=os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0"),
+    backend=os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+)
+celery.conf.update(
+    task_track_started=True,
+    # Transcriptions are long; hand each worker one job at a time and
+    # only acknowledge it once it is done, so a crashed worker's job is redelivered
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    # Redis redelivers unacknowledged jobs after the visibility timeout (1 hour by
+    # default), so it has to be longer than the longest job or they run twice
+    broker_transport_options={
+        'visibility_timeout': int(os.environ.get("CELERY_VISIBILITY_TIMEOUT_HOURS", "12")) * 3600
+    },
+    result_expires=int(os.environ.get("TASK_TTL_HOURS", "24")) * 3600
+)
+
+def _chunk_key(task_id, seq):
+    return f"transcribe-chunk-{task_id}-{seq}"
 
-def extract_video_id(url):
-    """Extract video ID from various YouTube URL formats"""
-    patterns = [
-        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-        r'youtu\.be\/([0-9A-Za-z_-]{11})',
-        r'youtube\.com\/embed\/([0-9A-Za-z_-]{11})'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    
-    parsed_url = urlparse(url)
-    query_params = parse_qs(parsed_url.query)
-    if 'v' in query_params:
-        return query_params['v'][0]
-    
-    return None
+def read_chunks(task_id, start, end=None):
+    """Return the chunks a task published from sequence number start, up to end or to the last one so far"""
+    chunks = []
+    while end is None or start + len(chunks) < end:
+        value = celery.backend.get(_chunk_key(task_id, start + len(chunks)))
+        if value is None:
+            break
+        chunks.append(json.loads(value))
+    return chunks
+
+@worker_process_init.connect
+def load_model(**kwargs):
+    """Start loading the Whisper models once when each worker process starts"""
+    pipeline.init_inference()
 
 @celery.task(bind=True)
-def transcribe_video(self, url):
+def transcribe_video(self, url, model_name=None):
+    """Download and transcribe a video on a worker, reporting progress through the result backend
+
+    Each chunk transcribed is stored once in the result backend under its
+    sequence number, and progress states carry the number of chunks so far
+    under 'chunks', so the web app can fetch only the new ones with
+    read_chunks() and stream the text as it is decoded.
+    """
+    chunks = [0]
+    status = {}
+    failure = {}
+
+    def report(state):
+        if state['state'] == 'FAILURE':
+            failure['error'] = state['status']
+        else:
+            status.update(state['status'])
+            self.update_state(state='PROGRESS', meta=dict(status, chunks=chunks[0]))
+
+    def on_chunk(chunk):
+        celery.backend.set(_chunk_key(self.request.id, chunks[0]), json.dumps(chunk))
+        chunks[0] += 1
+        self.update_state(state='PROGRESS', meta=dict(status, chunks=chunks[0]))
+
     try:
-        # Extract video ID and validate
-        video_id = extract_video_id(url)
-        if not video_id:
-            return {"success": False, "error": "Invalid YouTube URL format"}
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 1, 'total': 10, 'status': 'Extracting video info...'}
-        )
-        
-        # Construct a clean URL
-        clean_url = f"https://www.youtube.com/watch?v={video_id}"
-        
-        # Create YouTube object
-        yt = YouTube(clean_url)
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 2, 'total': 10, 'status': 'Finding audio stream...'}
-        )
-        
-        # Get audio stream
-        audio_streams = yt.streams.filter(only_audio=True).order_by('abr').desc()
-        
-        if not audio_streams:
-            return {"success": False, "error": "No audio streams available for this video"}
-        
-        audio_stream = audio_streams.first()
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 3, 'total': 10, 'status': 'Downloading audio...'}
-        )
-        
-        # Download the audio
-        audio_file = audio_stream.download(output_path="downloads", filename_prefix=f"{video_id}_")
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 4, 'total': 10, 'status': 'Loading speech recognition model...'}
-        )
-        
-        # Load Whisper model
-        model = whisper.load_model("base")
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 5, 'total': 10, 'status': 'Transcribing audio...'}
-        )
-        
-        # Transcribe with language detection
-        result = model.transcribe(
-            audio_file,
-            fp16=False,
-            language=None,
-            task="transcribe",
-            verbose=False
-        )
-        
-        transcription = result["text"]
-        detected_language = result.get("language", "unknown")
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 8, 'total': 10, 'status': 'Saving transcription...'}
-        )
-        
-        # Save transcription
-        txt_filename = f"downloads/{video_id}.txt"
-        with open(txt_filename, "w", encoding="utf-8") as f:
-            f.write(f"Title: {yt.title}\n")
-            f.write(f"URL: {clean_url}\n")
-            f.write(f"Language: {detected_language}\n\n")
-            f.write(transcription)
-        
-        # Update task status
-        self.update_state(
-            state='PROGRESS',
-            meta={'current': 9, 'total': 10, 'status': 'Cleaning up...'}
-        )
-        
-        # Clean up audio file to save space
-        try:
-            os.remove(audio_file)
-        except:
-            pass
-        
-        # Return the result
-        return {
-            "success": True,
-            "transcription": transcription,
-            "title": yt.title,
-            "video_id": video_id,
-            "language": detected_language,
-            "txt_file": txt_filename
-        }
-        
+        result = pipeline.transcribe_video(url, report, model_name=model_name, on_chunk=on_chunk)
     except Exception as e:
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+    return result or {"success": False, "error": failure.get('error', 'Transcription failed')}
@@ -0,0 +1,47 @@
+"""Batched decoding must give the same text as model.transcribe() on each chunk
+
+Runs the real model on test_audio.mp3, so it needs whisper, torch and
+ffmpeg, and downloads the model (WHISPER_TEST_MODEL, "tiny" by default)
+the first time.
+"""
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("torch")
+whisper = pytest.importorskip("whisper")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg is needed to decode the test audio", allow_module_level=True)
+
+from batch_decoder import detect_language, transcribe_batch  # noqa: E402
+from segmentation import speech_segments  # noqa: E402
+
+TEST_AUDIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_audio.mp3")
+BATCH_SIZE = 4
+
+
+@pytest.fixture(scope="module")
+def model():
+    return whisper.load_model(os.environ.get("WHISPER_TEST_MODEL", "tiny"), device="cpu")
+
+
+@pytest.fixture(scope="module")
+def chunks():
+    audio = whisper.load_audio(TEST_AUDIO)
+    return [audio[start:end] for start, end in speech_segments(audio, max_duration=30)[:BATCH_SIZE]]
+
+
+def test_detect_language_matches_transcribe(model, chunks):
+    for chunk in chunks:
+        assert detect_language(model, chunk) == model.transcribe(chunk, fp16=False)["language"]
+
+
+def test_batch_matches_transcribe_chunk_by_chunk(model, chunks):
+    language = detect_language(model, chunks[0])
+    results = transcribe_batch(model, chunks, language=language)
+    for chunk, result in zip(chunks, results):
+        expected = model.transcribe(chunk, fp16=False, language=language)
+        assert result["text"] == expected["text"]
+        assert result["language"] == expected["language"]
+
@@ -0,0 +1,118 @@
+import pytest
+
+import job_store
+from job_store import MemoryStore, SQLiteStore, open_store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_store, "time", clock)
+    return clock
+
+
+def test_memory_store_get_set_delete():
+    store = MemoryStore(max_entries=10, ttl=60)
+    store["a"] = {"state": "PENDING"}
+    assert store["a"] == {"state": "PENDING"}
+    assert "a" in store
+    assert store.get("missing", "default") == "default"
+
+    del store["a"]
+    assert "a" not in store
+    with pytest.raises(KeyError):
+        store["a"]
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_entries=2, ttl=60)
+    store["a"] = 1
+    store["b"] = 2
+    store.get("a")
+    store["c"] = 3
+    assert "a" in store
+    assert "b" not in store
+    assert "c" in store
+
+
+def test_memory_store_expires_entries(clock):
+    store = MemoryStore(max_entries=10, ttl=60)
+    store["a"] = 1
+    clock.now += 59
+    assert store.get("a") == 1
+    clock.now += 2
+    assert store.get("a") is None
+
+
+def test_memory_store_set_many():
+    store = MemoryStore(max_entries=10, ttl=60)
+    store.set_many({"a": 1, "b": 2})
+    assert (store["a"], store["b"]) == (1, 2)
+
+
+def test_memory_store_keeps_pinned_entries(clock):
+    store = MemoryStore(max_entries=2, ttl=60)
+    store.pin("job")
+    store["job"] = "running"
+    for i in range(5):
+        store[i] = i
+    clock.now += 120
+    store["late"] = "new"
+    assert store["job"] == "running"
+
+    store.unpin("job")
+    store["other"] = "new"
+    assert "job" not in store
+
+
+def test_memory_store_full_of_pinned_entries_still_accepts_writes():
+    store = MemoryStore(max_entries=1, ttl=60)
+    for key in ("a", "b", "c"):
+        store.pin(key)
+        store[key] = key
+    assert [store[key] for key in ("a", "b", "c")] == ["a", "b", "c"]
+
+
+def test_sqlite_store_round_trips_json(tmp_path):
+    store = SQLiteStore(str(tmp_path / "jobs.db"), "tasks", ttl=60)
+    store["a"] = {"state": "SUCCESS", "result": {"text": "héllo", "chunks": [1, 2]}}
+    assert store["a"] == {"state": "SUCCESS", "result": {"text": "héllo", "chunks": [1, 2]}}
+
+    store.set_many({"b": 1, "c": [2]})
+    assert (store["b"], store["c"]) == (1, [2])
+
+    del store["a"]
+    assert "a" not in store
+
+
+def test_sqlite_store_expires_rows(tmp_path, clock):
+    store = SQLiteStore(str(tmp_path / "jobs.db"), "tasks", ttl=60)
+    store["a"] = 1
+    clock.now += 61
+    assert store.get("a") is None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    SQLiteStore(path, "tasks", ttl=60)["a"] = 1
+    assert SQLiteStore(path, "tasks", ttl=60)["a"] == 1
+    assert "a" not in SQLiteStore(path, "batches", ttl=60)
+
+
+def test_open_store_follows_job_store(tmp_path, monkeypatch):
+    monkeypatch.delenv("JOB_STORE", raising=False)
+    assert isinstance(open_store("tasks", ttl=60), MemoryStore)
+
+    monkeypatch.setenv("JOB_STORE", "sqlite")
+    monkeypatch.setenv("JOB_STORE_PATH", str(tmp_path / "jobs.db"))
+    store = open_store("tasks", ttl=60)
+    assert isinstance(store, SQLiteStore)
+    assert store.path == str(tmp_path / "jobs.db")
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from scheduler import JobScheduler, QueueFull, default_worker_count
+
+
+def test_default_worker_count_is_at_least_one():
+    assert default_worker_count() >= 1
+    assert default_worker_count(job_memory_mb=10 ** 9) == 1
+
+
+def test_positions_follow_priority_then_submission_order():
+    scheduler = JobScheduler(workers=0, max_queue=10)
+    scheduler.submit("low", print, priority=-1)
+    scheduler.submit("first", print)
+    scheduler.submit("high", print, priority=5)
+    scheduler.submit("second", print)
+
+    assert scheduler.queue_depth() == 4
+    assert [scheduler.position(job) for job in ("high", "first", "second", "low")] == [1, 2, 3, 4]
+    assert scheduler.position("unknown") is None
+
+
+def test_submit_raises_when_queue_is_full():
+    scheduler = JobScheduler(workers=0, max_queue=2)
+    scheduler.submit("a", print)
+    scheduler.submit("b", print)
+    with pytest.raises(QueueFull):
+        scheduler.submit("c", print)
+
+    # A cancelled job frees its slot
+    assert scheduler.cancel("a")
+    scheduler.submit("c", print)
+
+
+def test_cancel_only_removes_queued_jobs():
+    scheduler = JobScheduler(workers=0, max_queue=10)
+    scheduler.submit("a", print)
+    scheduler.submit("b", print)
+    assert scheduler.cancel("a")
+    assert not scheduler.cancel("a")
+    assert not scheduler.cancel("unknown")
+    assert scheduler.queue_depth() == 1
+    assert scheduler.position("b") == 1
+
+
+def test_workers_run_jobs_by_priority():
+    scheduler = JobScheduler(workers=1, max_queue=10)
+    started = threading.Event()
+    release = threading.Event()
+    done = threading.Event()
+    order = []
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    # Keep the only worker busy while the other jobs are queued
+    scheduler.submit("blocker", block)
+    assert started.wait(5)
+    assert scheduler.active_jobs() == 1
+
+    scheduler.submit("low", order.append, ("low",), priority=-1)
+    scheduler.submit("cancelled", order.append, ("cancelled",))
+    scheduler.submit("normal", order.append, ("normal",))
+    scheduler.submit("high", order.append, ("high",), priority=1)
+    scheduler.submit("last", done.set)
+    scheduler.cancel("cancelled")
+    release.set()
+
+    assert done.wait(5)
+    assert order == ["high", "normal", "low"]
+
+
+def test_failing_job_does_not_stop_its_worker():
+    scheduler = JobScheduler(workers=1, max_queue=10)
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.submit("fail", fail)
+    scheduler.submit("next", done.set)
+    assert done.wait(5)
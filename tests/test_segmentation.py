@@ -0,0 +1,124 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+pytest.importorskip("whisper")
+
+from segmentation import iter_speech_blocks, speech_segments  # noqa: E402
+from whisper.audio import SAMPLE_RATE  # noqa: E402
+
+TEST_AUDIO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_audio.mp3")
+
+
+def make_audio(pattern, seed=0):
+    """Noise bursts standing in for speech, separated by near silence: [(seconds, is_speech), ...]"""
+    rng = np.random.default_rng(seed)
+    parts = [
+        rng.standard_normal(int(seconds * SAMPLE_RATE)).astype(np.float32) * (0.3 if is_speech else 1e-4)
+        for seconds, is_speech in pattern
+    ]
+    return np.concatenate(parts)
+
+
+def chunked(audio, seconds):
+    size = int(seconds * SAMPLE_RATE)
+    return [audio[i:i + size] for i in range(0, len(audio), size)]
+
+
+def absolute_segments(blocks):
+    """Segments of every block as sample ranges of the whole stream, checking each block on the way"""
+    segments = []
+    position = 0
+    for offset, block, block_segments in blocks:
+        assert offset >= position
+        assert block_segments
+        for start, end in block_segments:
+            assert 0 <= start < end <= len(block)
+            segments.append((offset + start, offset + end))
+        position = offset + block_segments[-1][1]
+    return segments
+
+
+def covers(segments, start, end):
+    return any(s <= start * SAMPLE_RATE and end * SAMPLE_RATE <= e for s, e in segments)
+
+
+def test_speech_segments_skip_silence():
+    audio = make_audio([(1, False), (2, True), (2, False), (2, True), (1, False)])
+    # Short enough that the two bursts cannot be packed into one segment
+    segments = speech_segments(audio, max_duration=3)
+    assert len(segments) == 2
+    assert covers(segments, 1, 3)
+    assert covers(segments, 5, 7)
+    assert sum(end - start for start, end in segments) < 5 * SAMPLE_RATE
+
+
+def test_speech_segments_respect_max_duration():
+    audio = make_audio([(2, False), (9, True), (2, False)])
+    segments = speech_segments(audio, max_duration=2)
+    assert len(segments) >= 5
+    assert all(end - start <= 2 * SAMPLE_RATE for start, end in segments)
+    # Split pieces follow each other without gaps
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+
+
+def test_speech_is_not_cut_at_chunk_boundaries():
+    pattern = [(1, False), (2, True), (1, False), (2, True), (1, False), (2, True), (1, False)]
+    audio = make_audio(pattern)
+    # 3 s chunks end in the middle of the second and third bursts
+    segments = absolute_segments(iter_speech_blocks(chunked(audio, 3), max_duration=3))
+    assert len(segments) == 3
+    for start in (1, 4, 7):
+        assert covers(segments, start, start + 2)
+    assert all(a[1] <= b[0] for a, b in zip(segments, segments[1:]))
+
+
+def test_speech_running_to_the_end_is_yielded():
+    audio = make_audio([(1, False), (2, True), (1, False), (2.5, True)])
+    blocks = list(iter_speech_blocks(chunked(audio, 3)))
+    segments = absolute_segments(blocks)
+    assert covers(segments, 4, 6.5)
+    assert segments[-1][1] == len(audio)
+
+
+def test_long_speech_is_split_at_max_duration():
+    audio = make_audio([(2, False), (5, True), (2, False)])
+    segments = absolute_segments(iter_speech_blocks(chunked(audio, 4), max_duration=2))
+    assert all(end - start <= 2 * SAMPLE_RATE for start, end in segments)
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert covers([(segments[0][0], segments[-1][1])], 2, 7)
+
+
+def test_silent_stream_yields_nothing():
+    audio = make_audio([(5, False)])
+    assert list(iter_speech_blocks(chunked(audio, 2))) == []
+
+
+def test_continuous_speech_is_kept():
+    # No quiet frames to put the noise floor on
+    audio = make_audio([(9, True)])
+    segments = speech_segments(audio, max_duration=30)
+    assert segments == [(0, len(audio))]
+
+
+def test_short_speech_block_at_the_end_is_kept():
+    audio = make_audio([(1, False), (2, True), (1, False), (2.8, True)])
+    # The last chunk holds nothing but speech
+    segments = absolute_segments(iter_speech_blocks(chunked(audio, 4), max_duration=3))
+    assert covers(segments, 4, 6.8)
+
+
+def test_test_audio_is_mostly_kept():
+    if shutil.which("ffmpeg") is None:
+        pytest.skip("ffmpeg is needed to decode the test audio")
+    import whisper
+
+    # A song: vocals and music nearly all the way through
+    audio = whisper.load_audio(TEST_AUDIO)
+    segments = speech_segments(audio)
+    assert sum(end - start for start, end in segments) >= 0.8 * len(audio)
+
+    streamed = absolute_segments(iter_speech_blocks(chunked(audio, 120)))
+    assert sum(end - start for start, end in streamed) >= 0.8 * len(audio)
@@ -0,0 +1,67 @@
+import json
+
+from transcript import Transcript, _format_timestamp
+
+SEGMENTS = [
+    {
+        "start": 0.0,
+        "end": 2.5,
+        "text": " Hello world",
+        "words": [
+            {"start": 0.0, "end": 1.0, "word": " Hello", "probability": 0.9},
+            {"start": 1.2, "end": 2.5, "word": " world", "probability": 0.75},
+        ],
+    },
+    {"start": 3661.5, "end": 3662.25, "text": " Ça va? 日本語", "words": []},
+]
+
+
+def test_format_timestamp():
+    assert _format_timestamp(0, ",") == "00:00:00,000"
+    assert _format_timestamp(3661.5, ",") == "01:01:01,500"
+    assert _format_timestamp(59.9996, ".") == "00:01:00.000"
+
+
+def test_segments_round_trip():
+    transcript = Transcript.from_segments(SEGMENTS)
+    assert len(transcript) == 2
+    segments = list(transcript.segments())
+    assert [segment["text"] for segment in segments] == [" Hello world", " Ça va? 日本語"]
+    assert segments[1]["start"] == 3661.5
+    assert segments[1]["words"] == []
+    assert segments[0]["words"][1]["word"] == " world"
+    assert abs(segments[0]["words"][1]["probability"] - 0.75) < 1e-6
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "video.npz")
+    Transcript.from_segments(SEGMENTS).save(path)
+    assert list(Transcript.load(path).segments()) == list(Transcript.from_segments(SEGMENTS).segments())
+
+
+def test_empty_transcript():
+    transcript = Transcript.from_segments([])
+    assert len(transcript) == 0
+    assert list(transcript.segments()) == []
+    assert transcript.to_srt() == ""
+    assert transcript.to_vtt() == "WEBVTT\n"
+
+
+def test_subtitle_formats():
+    transcript = Transcript.from_segments(SEGMENTS)
+    assert transcript.to_srt() == (
+        "1\n00:00:00,000 --> 00:00:02,500\n Hello world\n\n"
+        "2\n01:01:01,500 --> 01:01:02,250\n Ça va? 日本語\n"
+    )
+    assert transcript.to_vtt() == (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:02.500\n Hello world\n\n"
+        "01:01:01.500 --> 01:01:02.250\n Ça va? 日本語\n"
+    )
+
+
+def test_json_includes_metadata():
+    data = json.loads(Transcript.from_segments(SEGMENTS).to_json(video_id="abc", language="en"))
+    assert data["video_id"] == "abc"
+    assert data["language"] == "en"
+    assert [segment["end"] for segment in data["segments"]] == [2.5, 3662.25]
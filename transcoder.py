@@ -0,0 +1,96 @@
+import queue
+import subprocess
+import threading
+import time
+
+
+def run_ffmpeg(cmd, duration=None, report=None):
+    """Run an ffmpeg command, reporting the fraction done from its -progress output
+
+    Returns True if ffmpeg succeeded.
+    """
+    cmd = [cmd[0], '-nostdin', '-progress', 'pipe:1', '-nostats', '-loglevel', 'error'] + cmd[1:]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    # Drain stderr in the background so ffmpeg never blocks on a full pipe
+    errors = []
+    stderr_thread = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+    stderr_thread.start()
+
+    for line in process.stdout:
+        key, _, value = line.strip().partition('=')
+        if key == 'out_time_us' and duration and report and value.isdigit():
+            report(min(int(value) / 1e6 / duration, 1.0))
+
+    returncode = process.wait()
+    stderr_thread.join()
+    if returncode != 0:
+        print(f"FFmpeg error: {''.join(errors)}")
+        return False
+    return True
+
+
+class TranscodeQueue:
+    """Background queue that produces download artifacts (MP3, MP4) on demand
+
+    Each (video_id, format) pair is built at most once at a time; asking for
+    one that is already queued or running returns its current state. A
+    failed build keeps its FAILURE state for retry_after seconds, so an
+    artifact that cannot be built is not rebuilt on every request.
+    """
+
+    def __init__(self, workers, retry_after=300):
+        self.retry_after = retry_after
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"transcoder-{i}", daemon=True)
+            thread.start()
+
+    def request(self, video_id, format, builder, retry=False):
+        """Queue builder(report) to produce the artifact unless it is already queued or running
+
+        Returns the job state: {'state': 'PENDING'|'PROGRESS'|'SUCCESS'|'FAILURE', ...}.
+        A failed job is queued again once retry_after seconds have passed, or
+        right away if retry is set.
+        """
+        key = (video_id, format)
+        with self.lock:
+            job = self.jobs.get(key)
+            failed = job is not None and job['state'] == 'FAILURE'
+            if job is None or failed and (retry or time.time() - job['failed_at'] >= self.retry_after):
+                job = {'state': 'PENDING', 'progress': 0.0, 'status': 'Waiting for transcoder...'}
+                self.jobs[key] = job
+                self.queue.put((key, builder))
+            return dict(job)
+
+    def status(self, video_id, format):
+        """Return the state of an artifact job, or None if it was never requested"""
+        with self.lock:
+            job = self.jobs.get((video_id, format))
+            return dict(job) if job else None
+
+    def forget(self, video_id, format):
+        """Drop the state of a finished job, e.g. after its file has been removed"""
+        with self.lock:
+            self.jobs.pop((video_id, format), None)
+
+    def _update(self, key, **state):
+        with self.lock:
+            self.jobs[key].update(state)
+
+    def _worker(self):
+        while True:
+            key, builder = self.queue.get()
+            self._update(key, state='PROGRESS', status=f'Preparing {key[1].upper()}...')
+
+            def report(progress, key=key):
+                self._update(key, progress=round(progress, 3))
+
+            try:
+                file_path = builder(report)
+                self._update(key, state='SUCCESS', progress=1.0, status='Ready', file=file_path)
+            except Exception as e:
+                print(f"Error preparing {key[1]} for {key[0]}: {str(e)}")
+                self._update(key, state='FAILURE', status=str(e), failed_at=time.time())
@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+
+
+def _pack_text(texts):
+    """Concatenate strings as UTF-8 bytes with the offset where each one starts and ends"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _format_timestamp(seconds, separator):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+class Transcript:
+    """Segment and word timings of a transcript, stored column by column in numpy arrays
+
+    Times are in seconds from the start of the video. The words of segment i
+    are rows word_index[i]:word_index[i+1] of the word columns, and text is
+    kept as one UTF-8 buffer per level with byte offsets into it.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a transcript from dicts with start, end, text and optional words"""
+        words = [word for segment in segments for word in segment.get("words", [])]
+        segment_text, segment_text_index = _pack_text([segment["text"] for segment in segments])
+        word_text, word_text_index = _pack_text([word["word"] for word in words])
+        word_index = np.zeros(len(segments) + 1, dtype=np.int64)
+        np.cumsum([len(segment.get("words", [])) for segment in segments], out=word_index[1:])
+
+        return cls({
+            "segment_start": np.array([segment["start"] for segment in segments], dtype=np.float64),
+            "segment_end": np.array([segment["end"] for segment in segments], dtype=np.float64),
+            "segment_text": segment_text,
+            "segment_text_index": segment_text_index,
+            "word_index": word_index,
+            "word_start": np.array([word["start"] for word in words], dtype=np.float64),
+            "word_end": np.array([word["end"] for word in words], dtype=np.float64),
+            "word_probability": np.array([word["probability"] for word in words], dtype=np.float32),
+            "word_text": word_text,
+            "word_text_index": word_text_index,
+        })
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def save(self, path):
+        """Write the columns to a compressed .npz file"""
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **self.columns)
+
+    def __len__(self):
+        return len(self.columns["segment_start"])
+
+    def _text(self, level, i):
+        buffer = self.columns[f"{level}_text"]
+        index = self.columns[f"{level}_text_index"]
+        return buffer[index[i]:index[i + 1]].tobytes().decode("utf-8")
+
+    def segments(self):
+        """Yield each segment as a dict with start, end, text and words"""
+        columns = self.columns
+        for i in range(len(self)):
+            words = range(columns["word_index"][i], columns["word_index"][i + 1])
+            yield {
+                "start": float(columns["segment_start"][i]),
+                "end": float(columns["segment_end"][i]),
+                "text": self._text("segment", i),
+                "words": [
+                    {
+                        "start": float(columns["word_start"][w]),
+                        "end": float(columns["word_end"][w]),
+                        "word": self._text("word", w),
+                        "probability": float(columns["word_probability"][w]),
+                    }
+                    for w in words
+                ],
+            }
+
+    def to_srt(self):
+        blocks = []
+        for number, segment in enumerate(self.segments(), start=1):
+            start = _format_timestamp(segment["start"], ",")
+            end = _format_timestamp(segment["end"], ",")
+            blocks.append(f"{number}\n{start} --> {end}\n{segment['text']}\n")
+        return "\n".join(blocks)
+
+    def to_vtt(self):
+        blocks = ["WEBVTT\n"]
+        for segment in self.segments():
+            start = _format_timestamp(segment["start"], ".")
+            end = _format_timestamp(segment["end"], ".")
+            blocks.append(f"{start} --> {end}\n{segment['text']}\n")
+        return "\n".join(blocks)
+
+    def to_json(self, **metadata):
+        return json.dumps(dict(metadata, segments=list(self.segments())), ensure_ascii=False, indent=2)
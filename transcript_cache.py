@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Temporary files older than this are left over from a crash during put()
+TMP_MAX_AGE = 3600
+
+
+def cache_key(video_id, model_name, language=None, task="transcribe"):
+    """Build a content-addressed key from the video ID and transcription options"""
+    options = {
+        'video_id': video_id,
+        'model': model_name,
+        'language': language or 'auto',
+        'task': task,
+    }
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class TranscriptCache:
+    """On-disk cache of finished transcription results with size- and age-based LRU eviction
+
+    Each entry is one JSON file named after its key. Its modification time
+    is when it was written, which max_age is measured from; its access time
+    is set explicitly on every hit and orders the LRU eviction. Both live in
+    the file itself, so the cache survives process restarts without a
+    separate index.
+    """
+
+    def __init__(self, directory, max_bytes, max_age):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Return the cached result for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if time.time() - stat.st_mtime > self.max_age:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            # Record the hit without touching the write time
+            os.utime(path, (time.time(), stat.st_mtime))
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        """Store a result and evict old entries if the cache is over budget"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing transcript cache entry: {str(e)}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove expired entries and stale temporary files, then least recently used entries until under the size budget"""
+        with self.lock:
+            now = time.time()
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith((".json", ".tmp")):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp"):
+                    if now - stat.st_mtime > TMP_MAX_AGE:
+                        self._remove(path)
+                elif now - stat.st_mtime > self.max_age:
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            print(f"Evicted transcript cache entry: {path}")
+        except OSError:
+            pass